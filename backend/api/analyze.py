@@ -2,22 +2,147 @@
 API endpoints for stream analysis.
 """
 
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
 import re
-from typing import Union
-from urllib.parse import urlparse, parse_qs
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
+import socket
+from typing import Optional, Union
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import Response
 
-from models.schemas import AnalyzeRequest, AnalyzeResponse, ErrorResponse
+from models.schemas import (
+    AnalyzeRequest, AnalyzeResponse, CacheInvalidateRequest,
+    DRMInfo, ErrorResponse
+)
 from services.hls_parser import parse_hls_manifest
 from services.dash_parser import parse_dash_manifest
 from services.scte35_parser import extract_scte35_markers
-from services.ffmpeg_analyzer import analyze_video_fragments
+from services.ffmpeg_analyzer import analyze_video_fragments, get_fragment_urls
+from services.cache import TTLCache, manifest_cache
 
 router = APIRouter(prefix="/api", tags=["analysis"])
 
+# Host, path and query of an http(s) URL in a single match, replacing
+# urlparse on the validate_manifest_url hot path
+_URL_RE = re.compile(
+    r'(?i)^https?://'
+    r'(?:[^/?#]*@)?'                            # Optional userinfo, up to the last '@'
+    r'(?P<host>\[[^\]/?#]*\]|[^@:/?#]+)'        # Hostname or [IPv6] literal
+    r'(?::\d*)?'                                # Optional port
+    r'(?P<path>/[^?#]*)?'
+    r'(?:\?(?P<query>[^#]*))?'
+    r'(?:#.*)?$'
+)
 
-def validate_manifest_url(url: str) -> tuple[bool, str, str]:
+# Well-formed query string: one or more key=value pairs joined by '&'.
+# Validation only, so no dict is built the way parse_qs(strict_parsing=True) would
+_QUERY_RE = re.compile(r'^[^=&]+=[^&]*(?:&[^=&]+=[^&]*)*$')
+
+# Anchored shape check for IPv4 (dotted digits) and IPv6 (hex with colons)
+# literals; hostnames are lowercased before the check so no case folding is needed
+_IP_LITERAL_RE = re.compile(r'^(?:[0-9.]+|[0-9a-f.]*:[0-9a-f:.]*)$')
+
+# Domain suffixes owned by public CDNs (checked with a single str.endswith)
+_PUBLIC_CDN_SUFFIXES = (
+    '.akamaihd.net',
+    '.akamaized.net',
+    '.cloudfront.net',
+    '.fastly.net',
+    '.googlevideo.com',
+    '.llnwd.net',
+    '.azureedge.net',
+)
+
+# Resolved host addresses are reused for a short time only, so DNS changes
+# (and a host moving onto an internal address) are picked up quickly
+HOST_ADDRESS_CACHE_TTL = 60.0
+HOST_ADDRESS_CACHE_SIZE = 1024
+_host_address_cache = TTLCache(maxsize=HOST_ADDRESS_CACHE_SIZE, ttl=HOST_ADDRESS_CACHE_TTL)
+
+# Bearer token required by the cache admin endpoint; the endpoint is
+# disabled when it is not set
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
+
+# Parsed manifest keys copied straight onto AnalyzeResponse
+_RESULT_TRACK_FIELDS = ('bitrates', 'audio_tracks', 'subtitle_tracks', 'thumbnail_tracks')
+
+
+async def _resolve_host_addresses(hostname: str) -> tuple:
+    """
+    Resolve a hostname to its IP addresses without blocking the event loop.
+
+    Successful resolutions are cached per hostname for
+    HOST_ADDRESS_CACHE_TTL seconds; failed lookups are not cached, so a
+    transient DNS error is retried on the next request. Callers must
+    reject a host that resolves to no addresses.
+
+    Args:
+        hostname: Hostname or IP literal from the manifest URL
+
+    Returns:
+        Tuple of ipaddress objects (empty if the name does not resolve)
+    """
+    # Only attempt literal parsing when the whole host looks like an IP, so
+    # ordinary hostnames go straight to DNS without raising ValueError
+    if _IP_LITERAL_RE.match(hostname):
+        try:
+            return (ipaddress.ip_address(hostname),)
+        except ValueError:
+            pass
+
+    cached = _host_address_cache.get(hostname)
+    if cached is not None:
+        return cached
+
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(hostname, None)
+    except (socket.gaierror, UnicodeError):
+        return ()
+
+    addresses = []
+    for info in infos:
+        # Strip any IPv6 scope id (e.g. fe80::1%eth0) before parsing
+        address = info[4][0].split('%', 1)[0]
+        try:
+            addresses.append(ipaddress.ip_address(address))
+        except ValueError:
+            continue
+
+    addresses = tuple(addresses)
+    if addresses:
+        _host_address_cache.set(hostname, addresses)
+    return addresses
+
+
+def _is_internal_address(address) -> bool:
+    """
+    Check whether an IP address points at a private/internal network.
+
+    Args:
+        address: ipaddress.IPv4Address or ipaddress.IPv6Address
+
+    Returns:
+        True if the address must not be fetched
+    """
+    # Unwrap IPv4-mapped IPv6 addresses (e.g. ::ffff:127.0.0.1)
+    mapped = getattr(address, 'ipv4_mapped', None)
+    if mapped is not None:
+        address = mapped
+
+    return (
+        address.is_private or
+        address.is_loopback or
+        address.is_link_local or
+        address.is_reserved or
+        address.is_unspecified or
+        address.is_multicast
+    )
+
+
+async def validate_manifest_url(url: str) -> tuple[bool, str, str]:
     """
     Validate manifest URL format and determine type.
     Supports URLs with query parameters per TR-004.
@@ -28,14 +153,17 @@ def validate_manifest_url(url: str) -> tuple[bool, str, str]:
     Returns:
         Tuple of (is_valid, manifest_type, error_message)
     """
-    url_str = str(url)
+    # Split hostname, path and query (before fragment) in one regex match.
+    # This is the only full parse of the URL; AnalyzeRequest keeps it a str
+    url_match = _URL_RE.match(url)
+    if not url_match:
+        return False, '', 'Invalid URL format'
 
-    # Parse URL to get path component (before query parameters)
-    try:
-        parsed_url = urlparse(url_str)
-        path = parsed_url.path
-    except Exception as e:
-        return False, '', f'Invalid URL format: {str(e)}'
+    hostname = url_match.group('host')
+    if hostname.startswith('['):
+        hostname = hostname[1:-1]
+    path = url_match.group('path') or ''
+    query = url_match.group('query')
 
     # Check for valid extension on the path only (TR-004)
     if path.endswith('.m3u8'):
@@ -46,39 +174,41 @@ def validate_manifest_url(url: str) -> tuple[bool, str, str]:
         return False, '', 'URL path must end with .m3u8 (HLS) or .mpd (DASH)'
 
     # Validate query parameters are well-formed (TR-004)
-    if parsed_url.query:
-        try:
-            # Parse query string to ensure it's well-formed
-            parse_qs(parsed_url.query, strict_parsing=True)
-        except ValueError as e:
-            return False, '', f'Malformed query parameters: {str(e)}'
+    if query and not _QUERY_RE.match(query):
+        return False, '', 'Malformed query parameters: expected key=value pairs separated by &'
 
     # Security check: Prevent SSRF attacks
-    # Only check the hostname/netloc for private IPs, not query parameters
+    # Only check the hostname for private IPs, not query parameters
     # This prevents false positives when query params contain encoded data
-    hostname = parsed_url.netloc.lower()
-
-    blocked_patterns = [
-        r'localhost',
-        r'127\.0\.0\.',
-        r'0\.0\.0\.0',
-        r'169\.254\.',  # Link-local
-        r'10\.',        # Private network
-        r'172\.(1[6-9]|2[0-9]|3[0-1])\.',  # Private network
-        r'192\.168\.',  # Private network
-        r'\[::1\]',     # IPv6 loopback
-        r'\[::ffff:127\.0\.0\.1\]',  # IPv4-mapped IPv6 loopback
-    ]
-
-    for pattern in blocked_patterns:
-        if re.search(pattern, hostname, re.IGNORECASE):
+    if not hostname:
+        return False, '', 'URL must include a hostname'
+
+    hostname = hostname.lower()
+
+    # Hosts under well-known CDN domains always resolve to public edges,
+    # so skip DNS resolution for them
+    if hostname.endswith(_PUBLIC_CDN_SUFFIXES):
+        return True, manifest_type, ''
+
+    # Fail closed: a name that does not resolve here could still resolve
+    # (to an internal address) when the manifest is fetched
+    addresses = await _resolve_host_addresses(hostname)
+    if not addresses:
+        return False, '', 'Could not resolve host'
+
+    for address in addresses:
+        if _is_internal_address(address):
             return False, '', 'Access to private/internal URLs is not allowed'
 
     return True, manifest_type, ''
 
 
-@router.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_stream(request: AnalyzeRequest) -> Union[AnalyzeResponse, JSONResponse]:
+@router.post(
+    "/analyze",
+    response_model=AnalyzeResponse,
+    responses={500: {"model": ErrorResponse}}
+)
+async def analyze_stream(request: AnalyzeRequest) -> Union[AnalyzeResponse, Response]:
     """
     Analyze a streaming manifest (HLS or DASH).
 
@@ -94,60 +224,108 @@ async def analyze_stream(request: AnalyzeRequest) -> Union[AnalyzeResponse, JSON
     Raises:
         HTTPException: For validation errors, network errors, or parsing failures
     """
+    url_str = request.url
+
     # Validate URL format and type
-    is_valid, manifest_type, error_msg = validate_manifest_url(request.url)
+    is_valid, manifest_type, error_msg = await validate_manifest_url(url_str)
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
 
     try:
-        # Parse manifest based on type
-        if manifest_type == 'hls':
-            result = await parse_hls_manifest(str(request.url))
-        else:  # dash
-            result = await parse_dash_manifest(str(request.url))
-
-        # Extract SCTE-35 markers
-        scte35_markers = await extract_scte35_markers(
-            str(request.url),
-            manifest_type,
-            result
-        )
+        # Reuse the analysis of manifests seen before: static ones as they
+        # are, live ones once the server confirms they are unchanged (304)
+        cache_key = (url_str, manifest_type)
+        entry = manifest_cache.get(cache_key)
+        scte35_task = None
+        cacheable = False
+
+        if entry is None or entry['is_live']:
+            # Parse manifest based on type; None means the cached entry is current
+            request_headers = entry['request_headers'] if entry else None
+            if manifest_type == 'hls':
+                result = await parse_hls_manifest(url_str, request_headers)
+            else:  # dash
+                result = await parse_dash_manifest(url_str, request_headers)
+
+            if result is not None:
+                # Extract SCTE-35 markers
+                scte35_task = extract_scte35_markers(
+                    url_str,
+                    manifest_type,
+                    result
+                )
+
+                # Keep only what the response and fragment analysis need, not
+                # the raw lxml tree or m3u8 playlist the parser hands back.
+                # Missing track lists fall back to the schema's default_factory
+                # instead of a fresh [] per lookup
+                manifest_drm = result.get('drm_info')
+                entry = {
+                    'tracks': {
+                        field: result[field] for field in _RESULT_TRACK_FIELDS if field in result
+                    },
+                    'drm_info': manifest_drm,
+                    'fragment_urls': None if manifest_drm else get_fragment_urls(
+                        result, manifest_type, url_str
+                    ),
+                    'scte35_markers': None,
+                    'is_live': bool(result.get('is_live')),
+                    'request_headers': result.get('request_headers') or {},
+                }
+                # Live manifests change between requests, so only keep the
+                # ones the server lets us revalidate
+                cacheable = not entry['is_live'] or bool(entry['request_headers'])
 
         # Check if DRM is already detected from manifest
-        final_drm_info = result.get('drm_info')
+        final_drm_info = entry['drm_info']
+        scte35_markers = entry['scte35_markers']
         video_metadata = []
         ffmpeg_drm = None
 
         # Only analyze video fragments if DRM was not detected in manifest
         # This avoids long download times for DRM-protected content with large fragments
         if not final_drm_info:
-            video_metadata, ffmpeg_drm = await analyze_video_fragments(
-                result,
+            fragments_task = analyze_video_fragments(
+                {},
                 manifest_type,
-                str(request.url)
+                url_str,
+                fragment_urls=entry['fragment_urls']
             )
 
+            if scte35_task is None:
+                video_metadata, ffmpeg_drm = await fragments_task
+            else:
+                # SCTE-35 extraction and fragment analysis only read the parsed
+                # manifest, so run them concurrently
+                scte35_markers, (video_metadata, ffmpeg_drm) = await asyncio.gather(
+                    scte35_task,
+                    fragments_task
+                )
+
             # Use FFmpeg-detected DRM if available
             if ffmpeg_drm:
-                from models.schemas import DRMInfo
                 final_drm_info = DRMInfo(
                     system=ffmpeg_drm.get('system', 'Unknown'),
                     key_id=None,
                     license_url=None,
                     pssh=None
                 )
+        elif scte35_task is not None:
+            scte35_markers = await scte35_task
 
-        # Build response
-        response = AnalyzeResponse(
+        if cacheable:
+            entry['scte35_markers'] = scte35_markers
+            manifest_cache.set(cache_key, entry)
+
+        # Build response. Every field is already a validated model produced by
+        # our own parsers, so skip re-validating the nested lists here
+        response = AnalyzeResponse.model_construct(
             manifest_type=manifest_type,
-            manifest_url=str(request.url),
-            bitrates=result.get('bitrates', []),
-            audio_tracks=result.get('audio_tracks', []),
-            subtitle_tracks=result.get('subtitle_tracks', []),
-            thumbnail_tracks=result.get('thumbnail_tracks', []),
+            manifest_url=url_str,
             drm_info=final_drm_info,
             scte35_markers=scte35_markers,
-            video_metadata=video_metadata
+            video_metadata=video_metadata,
+            **entry['tracks']
         )
 
         return response
@@ -156,13 +334,59 @@ async def analyze_stream(request: AnalyzeRequest) -> Union[AnalyzeResponse, JSON
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        # Log error and return generic error response
-        error_response = ErrorResponse(
-            error="parsing_error",
-            message="Failed to parse manifest",
-            details=str(e)
-        )
-        return JSONResponse(
+        # Log error and return generic error response. The body follows the
+        # ErrorResponse schema but is encoded directly, skipping model
+        # construction on a path that timeouts can make hot under load
+        return Response(
             status_code=500,
-            content=error_response.model_dump()
+            content=json.dumps({
+                "error": "parsing_error",
+                "message": "Failed to parse manifest",
+                "details": str(e)
+            }),
+            media_type="application/json"
         )
+
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(
+    request: CacheInvalidateRequest,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Drop cached manifest analysis results (admin only).
+
+    Args:
+        request: CacheInvalidateRequest with the manifest URL to invalidate;
+            clears the whole cache if the URL is omitted
+        authorization: "Bearer <CACHE_ADMIN_TOKEN>" header
+
+    Returns:
+        dict: Number of cache entries removed
+
+    Raises:
+        HTTPException: 403 if no admin token is configured, 401 if the
+            request does not carry it
+    """
+    if not CACHE_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Cache administration is disabled")
+
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(
+        token.encode(), CACHE_ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid admin token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    if request.url is None:
+        removed = manifest_cache.clear()
+    else:
+        removed = sum(
+            manifest_cache.invalidate((request.url, manifest_type))
+            for manifest_type in ('hls', 'dash')
+        )
+
+    return {"invalidated": removed}
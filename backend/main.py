@@ -4,43 +4,78 @@ Stream-View Backend API
 FastAPI application for analyzing HLS and DASH stream manifests.
 """
 
-from fastapi import FastAPI
+import json
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from api.analyze import router as analyze_router
+from services.http_client import get_http_client, close_http_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the shared HTTP connection pool on startup and close it on shutdown.
+    """
+    app.state.http_client = get_http_client()
+    yield
+    await close_http_client()
+
 
 app = FastAPI(
     title="Stream-View API",
     description="API for analyzing HLS and DASH stream manifests",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
-# Configure CORS middleware for frontend communication
+# Frontend origins allowed to call the API (comma-separated)
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "http://localhost,http://localhost:5173").split(",")
+    if origin.strip()
+]
+
+# Configure CORS middleware for frontend communication. Explicit lists keep
+# Starlette on its static header path instead of reflecting request headers
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # TODO: Configure for production
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
 )
 
 # Include API routers
 app.include_router(analyze_router)
 
 
+# Static endpoint bodies, encoded once at import since they never change
+_HEALTH_JSON = json.dumps({
+    "status": "healthy",
+    "service": "stream-view-api",
+    "version": "0.1.0"
+}).encode()
+
+_ROOT_JSON = json.dumps({
+    "message": "Stream-View API",
+    "docs": "/docs",
+    "health": "/api/health"
+}).encode()
+
+
 @app.get("/api/health")
 async def health_check():
     """
     Health check endpoint for monitoring service availability.
 
     Returns:
-        dict: Status information
+        Response: Pre-encoded JSON status information
     """
-    return {
-        "status": "healthy",
-        "service": "stream-view-api",
-        "version": "0.1.0"
-    }
+    return Response(content=_HEALTH_JSON, media_type="application/json")
 
 
 @app.get("/")
@@ -49,10 +84,6 @@ async def root():
     Root endpoint with API information.
 
     Returns:
-        dict: Welcome message and documentation link
+        Response: Pre-encoded JSON welcome message and documentation link
     """
-    return {
-        "message": "Stream-View API",
-        "docs": "/docs",
-        "health": "/api/health"
-    }
+    return Response(content=_ROOT_JSON, media_type="application/json")
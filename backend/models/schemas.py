@@ -3,29 +3,53 @@ Pydantic models for Stream-View API requests and responses.
 """
 
 from typing import List, Optional, Literal
-from urllib.parse import urlparse
-from pydantic import BaseModel, HttpUrl, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class AnalyzeRequest(BaseModel):
     """Request model for stream analysis."""
-    url: HttpUrl = Field(..., description="URL of the HLS (.m3u8) or DASH (.mpd) manifest")
+    url: str = Field(
+        ...,
+        min_length=8,
+        max_length=2048,
+        pattern=r'(?i)^https?://[^/?#]',
+        description="URL of the HLS (.m3u8) or DASH (.mpd) manifest"
+    )
 
     @field_validator('url')
     @classmethod
     def validate_manifest_extension(cls, v):
         """
         Validate that the URL path ends with .m3u8 or .mpd (TR-004).
-        This provides early validation feedback to clients.
+        This provides early validation feedback to clients; full URL
+        parsing happens once in validate_manifest_url.
         """
-        parsed = urlparse(str(v))
-        path = parsed.path
+        path = v.split('#', 1)[0].split('?', 1)[0]
         if not (path.endswith('.m3u8') or path.endswith('.mpd')):
             raise ValueError('URL path must end with .m3u8 (HLS) or .mpd (DASH)')
         return v
 
 
-class BitrateInfo(BaseModel):
+class CacheInvalidateRequest(BaseModel):
+    """Request model for dropping cached analysis results."""
+    url: Optional[str] = Field(
+        None,
+        max_length=2048,
+        description="Manifest URL to invalidate; clears the whole cache if omitted"
+    )
+
+
+class ResponseModel(BaseModel):
+    """
+    Base for server-built response shapes.
+
+    Instances are frozen because cached analysis results share them
+    across requests.
+    """
+    model_config = ConfigDict(frozen=True)
+
+
+class BitrateInfo(ResponseModel):
     """Information about a specific bitrate level."""
     level: int = Field(..., description="Bitrate level index")
     bitrate: int = Field(..., description="Bitrate in bits per second")
@@ -35,7 +59,7 @@ class BitrateInfo(BaseModel):
     audio_codec: Optional[str] = Field(None, description="Audio codec")
 
 
-class AudioTrack(BaseModel):
+class AudioTrack(ResponseModel):
     """Information about an audio track."""
     language: str = Field(..., description="Language code (e.g., en, es)")
     name: Optional[str] = Field(None, description="Track name")
@@ -44,7 +68,7 @@ class AudioTrack(BaseModel):
     bitrate: Optional[int] = Field(None, description="Audio bitrate in bits per second")
 
 
-class SubtitleTrack(BaseModel):
+class SubtitleTrack(ResponseModel):
     """Information about a subtitle track."""
     language: str = Field(..., description="Language code (e.g., en, es)")
     name: Optional[str] = Field(None, description="Track name")
@@ -52,14 +76,14 @@ class SubtitleTrack(BaseModel):
     forced: bool = Field(False, description="Whether this is a forced subtitle track")
 
 
-class ThumbnailTrack(BaseModel):
+class ThumbnailTrack(ResponseModel):
     """Information about a thumbnail/image track."""
     resolution: Optional[str] = Field(None, description="Thumbnail resolution")
     url: Optional[str] = Field(None, description="Thumbnail track URL")
     format: Optional[str] = Field(None, description="Image format (e.g., JPEG, PNG)")
 
 
-class DRMInfo(BaseModel):
+class DRMInfo(ResponseModel):
     """Information about DRM protection."""
     system: str = Field(..., description="DRM system (e.g., Widevine, PlayReady, FairPlay)")
     key_id: Optional[str] = Field(None, description="Key ID if available")
@@ -67,7 +91,7 @@ class DRMInfo(BaseModel):
     pssh: Optional[str] = Field(None, description="Protection System Specific Header (base64)")
 
 
-class SCTE35Marker(BaseModel):
+class SCTE35Marker(ResponseModel):
     """SCTE-35 marker information."""
     event_id: Optional[int] = Field(None, description="Event ID")
     pts: Optional[int] = Field(None, description="Presentation Time Stamp")
@@ -80,7 +104,7 @@ class SCTE35Marker(BaseModel):
     pre_roll: Optional[int] = Field(None, description="Pre-roll time in milliseconds")
 
 
-class VideoMetadata(BaseModel):
+class VideoMetadata(ResponseModel):
     """Detailed video metadata from FFmpeg analysis."""
     level: int = Field(..., description="Bitrate level this metadata corresponds to")
     container_format: Optional[str] = Field(None, description="Container format (e.g., MPEG-TS, MP4)")
@@ -94,7 +118,7 @@ class VideoMetadata(BaseModel):
     file_size: Optional[int] = Field(None, description="Fragment file size in bytes")
 
 
-class AnalyzeResponse(BaseModel):
+class AnalyzeResponse(ResponseModel):
     """Response model for stream analysis."""
     manifest_type: Literal["hls", "dash"] = Field(..., description="Type of manifest analyzed")
     manifest_url: str = Field(..., description="Original manifest URL")
@@ -107,7 +131,7 @@ class AnalyzeResponse(BaseModel):
     video_metadata: List[VideoMetadata] = Field(default_factory=list, description="Detailed video metadata")
 
 
-class ErrorResponse(BaseModel):
+class ErrorResponse(ResponseModel):
     """Error response model."""
     error: str = Field(..., description="Error type")
     message: str = Field(..., description="Human-readable error message")
@@ -0,0 +1,115 @@
+"""
+In-process cache service.
+
+Provides a small TTL + LRU cache used to reuse manifest analysis results
+across repeated requests for the same URL, and helpers for revalidating
+cached manifests with conditional HTTP requests.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import httpx
+
+
+# Time-to-live for cached manifest analysis results (1 hour)
+MANIFEST_CACHE_TTL = 3600.0
+# Maximum number of cached manifests
+MANIFEST_CACHE_SIZE = 256
+
+
+class TTLCache:
+    """Least-recently-used cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Remove a single entry.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            True if an entry was removed
+        """
+        return self._entries.pop(key, None) is not None
+
+    def clear(self) -> int:
+        """
+        Remove all entries.
+
+        Returns:
+            Number of entries removed
+        """
+        count = len(self._entries)
+        self._entries.clear()
+        return count
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Track lists, manifest DRM info, fragment URLs and SCTE-35 markers keyed
+# by (url, manifest_type), with the conditional request headers needed to
+# revalidate live manifests (If-None-Match / If-Modified-Since)
+manifest_cache = TTLCache(maxsize=MANIFEST_CACHE_SIZE, ttl=MANIFEST_CACHE_TTL)
+
+def get_conditional_headers(response: httpx.Response) -> Dict[str, str]:
+    """
+    Build conditional request headers from a response's cache validators.
+
+    Args:
+        response: Manifest HTTP response
+
+    Returns:
+        Headers for revalidating the same resource (empty if the server
+        sent neither ETag nor Last-Modified)
+    """
+    headers = {}
+    etag = response.headers.get('etag')
+    if etag:
+        headers['If-None-Match'] = etag
+    last_modified = response.headers.get('last-modified')
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
@@ -5,58 +5,181 @@ Parses MPEG-DASH (.mpd) manifests and extracts stream information including
 bitrates, audio tracks, subtitles, and DRM information.
 """
 
+import asyncio
 import httpx
+import itertools
+import re
+import threading
+from functools import lru_cache
 from typing import Dict, List, Optional
-from xml.etree import ElementTree as ET
+from lxml import etree as ET
 from fastapi import HTTPException
 
 from models.schemas import (
     BitrateInfo, AudioTrack, SubtitleTrack,
     ThumbnailTrack, DRMInfo
 )
+from services.http_client import get_limited
+from services.cache import get_conditional_headers
 
 
 # Timeout for manifest downloads (30 seconds)
 MANIFEST_TIMEOUT = 30.0
 # Maximum manifest size (10MB)
 MAX_MANIFEST_SIZE = 10 * 1024 * 1024
+# Default DASH MPD namespace
+MPD_NAMESPACE = 'urn:mpeg:dash:schema:mpd:2011'
+# Common Encryption and PlayReady namespaces used inside ContentProtection
+CENC_NAMESPACE = 'urn:mpeg:cenc:2013'
+PLAYREADY_NAMESPACE = 'urn:microsoft:playready'
+CENC_DEFAULT_KID_ATTR = f'{{{CENC_NAMESPACE}}}default_KID'
+CENC_PSSH_TAG = f'{{{CENC_NAMESPACE}}}pssh'
+
+# Human-readable codec names keyed by RFC 6381 codec prefix (3 or 4 chars)
+CODEC_PREFIXES = {
+    'avc': 'H.264',
+    'hvc': 'H.265',
+    'hev': 'H.265',
+    'vp09': 'VP9',
+    'vp9': 'VP9',
+    'av01': 'AV1',
+    'mp4a': 'AAC',
+    'ac-3': 'AC3',
+    'ec-3': 'EAC3',
+}
+
+# DRM system IDs (DASH-IF registry) used in urn:uuid: schemeIdUri values
+DRM_SYSTEM_UUIDS = {
+    'edef8ba9-79d6-4ace-a3c8-27dcd51d21ed': 'Widevine',
+    '9a04f079-9840-4286-ab92-e65be0885f95': 'PlayReady',
+    '94ce86fb-07ff-4f43-adb8-93d2fa968ca2': 'FairPlay',
+    'e2719d58-a985-b3c9-781a-b030af78d30e': 'ClearKey',
+    '1077efec-c0b2-4d02-ace3-3c1e52e2fb4b': 'ClearKey',
+}
+# Fallback schemeIdUri substrings, checked in order
+DRM_SYSTEM_NAMES = (
+    ('widevine', 'Widevine'),
+    ('playready', 'PlayReady'),
+    ('fairplay', 'FairPlay'),
+    ('clearkey', 'ClearKey'),
+)
+DRM_UUID_RE = re.compile(r'[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}', re.IGNORECASE)
+# Fractional frameRate attribute, e.g. "30000/1001"
+FRAME_RATE_RE = re.compile(r'(\d+)/(\d+)')
+
+# DASH element lookups relative to their context element. Period,
+# AdaptationSet, Representation and Label are direct children per the MPD
+# schema, so child steps avoid descendant searches inside nested loops
+XPATH_EXPRESSIONS = {
+    'periods': './mpd:Period',
+    'adaptation_sets': './mpd:AdaptationSet',
+    'representations': './mpd:Representation',
+    'adaptation_set_content_protections': (
+        './mpd:ContentProtection | ./mpd:Representation/mpd:ContentProtection'
+    ),
+    'label': './mpd:Label',
+    'base_url': './mpd:BaseURL',
+    'segment_template': './mpd:SegmentTemplate',
+    'segment_list': './mpd:SegmentList',
+    'segment_timeline': './mpd:SegmentTimeline/mpd:S',
+    'segment_urls': './mpd:SegmentURL',
+    'initialization': './mpd:Initialization',
+    # Representations of video AdaptationSets (by the set's contentType /
+    # mimeType, or any Representation's own mimeType), in document order
+    'video_representations': (
+        './mpd:Period/mpd:AdaptationSet['
+        "contains(@contentType, 'video') or contains(@mimeType, 'video') or "
+        "mpd:Representation[contains(@mimeType, 'video')]"
+        ']/mpd:Representation'
+    ),
+}
+
+# Per-thread libxml2 parsers (lxml parser objects must not be shared across
+# threads while parsing)
+_parser_local = threading.local()
+
+
+def get_xml_parser() -> ET.XMLParser:
+    """
+    Get the manifest XML parser for the current thread.
+
+    The parser never loads DTDs, resolves entities or touches the network,
+    and drops nodes the analysis never reads (comments, processing
+    instructions, whitespace-only text) to keep the tree small.
+
+    Returns:
+        lxml XMLParser instance
+    """
+    parser = getattr(_parser_local, 'parser', None)
+    if parser is None:
+        parser = ET.XMLParser(
+            resolve_entities=False,
+            no_network=True,
+            load_dtd=False,
+            huge_tree=False,
+            remove_blank_text=True,
+            remove_comments=True,
+            remove_pis=True,
+            collect_ids=False
+        )
+        _parser_local.parser = parser
+    return parser
+
+
+@lru_cache(maxsize=8)
+def get_xpaths(mpd_namespace: str) -> Dict[str, ET.XPath]:
+    """
+    Compile the DASH XPath expressions for an MPD namespace.
+
+    Compiled expressions are cached per namespace, so each manifest reuses
+    them instead of re-parsing path strings on every lookup.
+
+    Args:
+        mpd_namespace: Namespace URI bound to the 'mpd' prefix
+
+    Returns:
+        Dictionary of expression name to compiled XPath
+    """
+    namespaces = {'mpd': mpd_namespace}
+    return {
+        name: ET.XPath(expression, namespaces=namespaces)
+        for name, expression in XPATH_EXPRESSIONS.items()
+    }
+
 
+# Compile the expressions for the standard MPD namespace at import
+get_xpaths(MPD_NAMESPACE)
 
-async def fetch_manifest(url: str) -> str:
+
+async def fetch_manifest(url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
     """
     Fetch manifest content from URL with timeout and size limits.
 
     Args:
         url: Manifest URL to fetch
+        headers: Extra request headers (e.g. conditional If-None-Match)
 
     Returns:
-        Manifest content as string
+        The HTTP response; status 304 when conditional headers matched
 
     Raises:
         HTTPException: If fetch fails or exceeds limits
     """
     try:
-        async with httpx.AsyncClient(timeout=MANIFEST_TIMEOUT) as client:
-            response = await client.get(url, follow_redirects=True)
-            response.raise_for_status()
-
-            # Check content size
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > MAX_MANIFEST_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Manifest size exceeds maximum of {MAX_MANIFEST_SIZE} bytes"
-                )
-
-            content = response.text
-            if len(content) > MAX_MANIFEST_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Manifest size exceeds maximum of {MAX_MANIFEST_SIZE} bytes"
-                )
-
-            return content
+        # Stream the body so oversized manifests are never fully buffered
+        response = await get_limited(
+            url, MAX_MANIFEST_SIZE, headers=headers, timeout=MANIFEST_TIMEOUT
+        )
+        if response is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Manifest size exceeds maximum of {MAX_MANIFEST_SIZE} bytes"
+            )
+
+        return response
 
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
         raise HTTPException(
             status_code=504,
@@ -74,7 +197,7 @@ async def fetch_manifest(url: str) -> str:
         )
 
 
-def get_namespace(root: ET.Element) -> Dict[str, str]:
+def get_namespace(root: ET._Element) -> Dict[str, str]:
     """
     Extract XML namespaces from MPD root element.
 
@@ -84,110 +207,124 @@ def get_namespace(root: ET.Element) -> Dict[str, str]:
     Returns:
         Dictionary of namespace prefixes to URIs
     """
-    namespaces = {}
+    # lxml exposes in-scope namespace declarations directly (default keyed by None)
+    namespaces = {prefix: uri for prefix, uri in root.nsmap.items() if prefix}
+
     # Default DASH namespace
     if root.tag.startswith('{'):
-        default_ns = root.tag[1:root.tag.index('}')]
-        namespaces['mpd'] = default_ns
+        namespaces['mpd'] = root.tag[1:root.tag.index('}')]
     else:
-        namespaces['mpd'] = 'urn:mpeg:dash:schema:mpd:2011'
-
-    # Extract all namespaces from root attributes
-    for key, value in root.attrib.items():
-        if key.startswith('{http://www.w3.org/2000/xmlns/}'):
-            prefix = key.split('}')[1]
-            namespaces[prefix] = value
+        namespaces['mpd'] = MPD_NAMESPACE
 
     return namespaces
 
 
-def parse_drm_info(root: ET.Element, namespaces: Dict[str, str]) -> Optional[DRMInfo]:
+def get_drm_system(scheme_id_uri: str) -> Optional[str]:
+    """
+    Identify the DRM system named by a ContentProtection schemeIdUri.
+
+    Args:
+        scheme_id_uri: schemeIdUri attribute (e.g. "urn:uuid:edef8ba9-...")
+
+    Returns:
+        DRM system name, or None for generic CENC / unknown schemes
+    """
+    uuid_match = DRM_UUID_RE.search(scheme_id_uri)
+    if uuid_match:
+        drm_system = DRM_SYSTEM_UUIDS.get(uuid_match.group(0).lower())
+        if drm_system:
+            return drm_system
+
+    # Some manifests name the system instead of using its UUID
+    scheme_id_lower = scheme_id_uri.lower()
+    for term, drm_system in DRM_SYSTEM_NAMES:
+        if term in scheme_id_lower:
+            return drm_system
+
+    return None
+
+
+def parse_drm_info(
+    root: ET._Element,
+    namespaces: Dict[str, str],
+    content_protections: Optional[List[ET._Element]] = None
+) -> Optional[DRMInfo]:
     """
     Extract DRM information from DASH manifest.
 
     Args:
         root: MPD root element
         namespaces: XML namespaces
+        content_protections: ContentProtection elements already collected by
+            parse_adaptation_sets; the manifest is searched when omitted
 
     Returns:
         DRMInfo if DRM is detected, None otherwise
     """
     # Look for ContentProtection elements (try both with and without namespace)
-    content_protections = root.findall('.//mpd:ContentProtection', namespaces)
-    if not content_protections:
-        # Try without namespace prefix (some manifests don't use namespaces)
-        content_protections = root.findall('.//ContentProtection')
-
-    # First pass: collect key_id from any ContentProtection element
+    # Searches are lazy iterfind walks, so they stop at the first DRM match
+    if content_protections is None:
+        content_protections = itertools.chain(
+            root.iterfind(f".//{{{namespaces['mpd']}}}ContentProtection"),
+            # Try without namespace prefix (some manifests don't use namespaces)
+            root.iterfind('.//ContentProtection')
+        )
+    elif not content_protections:
+        content_protections = root.iterfind('.//ContentProtection')
+
+    # Single pass: find the first specific DRM system (not generic CENC)
+    # while remembering the first key ID seen on any element, stopping as
+    # soon as both are known
+    drm_cp = None
+    drm_system = None
+    drm_key_id = None
     common_key_id = None
+
     for cp in content_protections:
         kid = (
             cp.get('default_KID') or
             cp.get('kid') or
-            cp.get('{urn:mpeg:cenc:2013}default_KID')
+            cp.get(CENC_DEFAULT_KID_ATTR)
         )
-        if kid:
+        if common_key_id is None:
             common_key_id = kid
-            break
 
-    # Second pass: find specific DRM system
-    for cp in content_protections:
-        scheme_id_uri = cp.get('schemeIdUri', '')
-
-        # Determine DRM system
-        drm_system = None
-        scheme_id_lower = scheme_id_uri.lower()
-
-        # Check for Widevine (both by name and UUID)
-        if 'widevine' in scheme_id_lower or 'edef8ba9-79d6-4ace-a3c8-27dcd51d21ed' in scheme_id_lower:
-            drm_system = 'Widevine'
-        # Check for PlayReady (both by name and UUID)
-        elif 'playready' in scheme_id_lower or '9a04f079-9840-4286-ab92-e65be0885f95' in scheme_id_lower:
-            drm_system = 'PlayReady'
-        elif 'fairplay' in scheme_id_lower:
-            drm_system = 'FairPlay'
-        elif 'clearkey' in scheme_id_lower:
-            drm_system = 'ClearKey'
-
-        # If we found a specific DRM system (not generic CENC), extract info and return
-        if drm_system:
-            # Extract key ID (check current element, or use common key_id)
-            key_id = (
-                cp.get('default_KID') or
-                cp.get('kid') or
-                cp.get('{urn:mpeg:cenc:2013}default_KID') or
-                common_key_id
-            )
+        if drm_cp is None:
+            drm_system = get_drm_system(cp.get('schemeIdUri', ''))
+            if drm_system:
+                drm_cp = cp
+                drm_key_id = kid
 
-            # Look for PSSH box (try multiple approaches)
-            pssh = None
-            # Try with cenc namespace if available
-            if 'cenc' in namespaces:
-                pssh_elem = cp.find('.//cenc:pssh', namespaces)
-                if pssh_elem is not None and pssh_elem.text:
-                    pssh = pssh_elem.text.strip()
-
-            # Try without namespace
-            if not pssh:
-                pssh_elem = cp.find('.//{urn:mpeg:cenc:2013}pssh')
-                if pssh_elem is not None and pssh_elem.text:
-                    pssh = pssh_elem.text.strip()
-
-            # Look for license URL (mspr namespace for PlayReady)
-            license_url = None
-            if 'playready' in scheme_id_uri.lower():
-                laurl = cp.find('.//mspr:laurl', namespaces)
-                if laurl is not None:
-                    license_url = laurl.text
-
-            return DRMInfo(
-                system=drm_system,
-                key_id=key_id,
-                license_url=license_url,
-                pssh=pssh
-            )
+        if drm_cp is not None and (drm_key_id or common_key_id):
+            break
 
-    return None
+    if drm_cp is None:
+        return None
+
+    # Look for the PSSH box and (for PlayReady) license URL in one walk,
+    # matching Clark-name tags instead of resolving prefixed paths
+    tags = {CENC_PSSH_TAG, f"{{{namespaces.get('cenc', CENC_NAMESPACE)}}}pssh"}
+    laurl_tag = None
+    if drm_system == 'PlayReady':
+        laurl_tag = f"{{{namespaces.get('mspr', PLAYREADY_NAMESPACE)}}}laurl"
+        tags.add(laurl_tag)
+
+    pssh = None
+    license_url = None
+    for elem in drm_cp.iter(*tags):
+        if elem.tag == laurl_tag:
+            if license_url is None:
+                license_url = elem.text
+        elif pssh is None and elem.text and elem.text.strip():
+            pssh = elem.text.strip()
+
+    return DRMInfo(
+        system=drm_system,
+        # Prefer the DRM element's own key ID over one found elsewhere
+        key_id=drm_key_id or common_key_id,
+        license_url=license_url,
+        pssh=pssh
+    )
 
 
 def parse_codec_string(codecs: str, mime_type: str) -> str:
@@ -204,321 +341,353 @@ def parse_codec_string(codecs: str, mime_type: str) -> str:
     if not codecs:
         return None
 
-    codecs_lower = codecs.lower()
-
-    if codecs_lower.startswith('avc'):
-        return 'H.264'
-    elif codecs_lower.startswith('hvc') or codecs_lower.startswith('hev'):
-        return 'H.265'
-    elif codecs_lower.startswith('vp09') or codecs_lower.startswith('vp9'):
-        return 'VP9'
-    elif codecs_lower.startswith('av01'):
-        return 'AV1'
-    elif codecs_lower.startswith('mp4a'):
-        return 'AAC'
-    elif codecs_lower.startswith('ac-3'):
-        return 'AC3'
-    elif codecs_lower.startswith('ec-3'):
-        return 'EAC3'
-    elif 'opus' in codecs_lower:
+    # Only the 3-4 character codec prefix needs lowercasing for the lookup
+    prefix = codecs[:4].lower()
+    codec_name = CODEC_PREFIXES.get(prefix) or CODEC_PREFIXES.get(prefix[:3])
+    if codec_name:
+        return codec_name
+    if 'opus' in codecs.lower():
         return 'Opus'
 
     return codecs
 
 
-def parse_bitrates(root: ET.Element, namespaces: Dict[str, str]) -> List[BitrateInfo]:
+def parse_frame_rate(frame_rate: Optional[str]) -> Optional[float]:
     """
-    Extract bitrate information from DASH manifest.
+    Parse a DASH frameRate attribute (e.g. "25" or "30000/1001").
 
     Args:
-        root: MPD root element
-        namespaces: XML namespaces
+        frame_rate: frameRate attribute value
 
     Returns:
-        List of BitrateInfo objects
+        Frame rate in fps, or None if missing or malformed
     """
-    bitrates = []
-    level = 0
+    if not frame_rate:
+        return None
 
-    # Find all video adaptation sets
-    for period in root.findall('.//mpd:Period', namespaces):
-        for adaptation_set in period.findall('.//mpd:AdaptationSet', namespaces):
-            # Check if this is a video adaptation set
-            content_type = adaptation_set.get('contentType', '')
-            mime_type = adaptation_set.get('mimeType', '')
+    fraction = FRAME_RATE_RE.fullmatch(frame_rate)
+    try:
+        if fraction:
+            return int(fraction.group(1)) / int(fraction.group(2))
+        return float(frame_rate)
+    except (ValueError, ZeroDivisionError):
+        return None
 
-            is_video = 'video' in content_type or 'video' in mime_type
-
-            # Also check representations
-            if not is_video:
-                for rep in adaptation_set.findall('.//mpd:Representation', namespaces):
-                    rep_mime = rep.get('mimeType', mime_type)
-                    if 'video' in rep_mime:
-                        is_video = True
-                        break
-
-            if not is_video:
-                continue
-
-            # Extract video representations
-            for representation in adaptation_set.findall('.//mpd:Representation', namespaces):
-                bandwidth = representation.get('bandwidth')
-                width = representation.get('width')
-                height = representation.get('height')
-                codecs = representation.get('codecs') or adaptation_set.get('codecs')
-                frame_rate = representation.get('frameRate') or adaptation_set.get('frameRate')
-
-                # Parse resolution
-                resolution = None
-                if width and height:
-                    resolution = f"{width}x{height}"
-
-                # Parse codec
-                rep_mime = representation.get('mimeType') or mime_type
-                codec = parse_codec_string(codecs, rep_mime) if codecs else None
-
-                # Parse frame rate
-                fps = None
-                if frame_rate:
-                    try:
-                        if '/' in str(frame_rate):
-                            num, den = frame_rate.split('/')
-                            fps = float(num) / float(den)
-                        else:
-                            fps = float(frame_rate)
-                    except:
-                        pass
-
-                bitrates.append(BitrateInfo(
-                    level=level,
-                    bitrate=int(bandwidth) if bandwidth else 0,
-                    resolution=resolution,
-                    codec=codec,
-                    frame_rate=fps,
-                    audio_codec=None
-                ))
-                level += 1
 
-    return bitrates
+def parse_video_representation(
+    representation: ET._Element,
+    adaptation_set: ET._Element,
+    level: int
+) -> BitrateInfo:
+    """
+    Build bitrate information for a single video representation.
 
+    Args:
+        representation: Representation element
+        adaptation_set: Parent AdaptationSet element
+        level: Bitrate level index
 
-def parse_audio_tracks(root: ET.Element, namespaces: Dict[str, str]) -> List[AudioTrack]:
+    Returns:
+        BitrateInfo object
     """
-    Extract audio track information from DASH manifest.
+    bandwidth = representation.get('bandwidth')
+    width = representation.get('width')
+    height = representation.get('height')
+    codecs = representation.get('codecs') or adaptation_set.get('codecs')
+    frame_rate = representation.get('frameRate') or adaptation_set.get('frameRate')
+
+    # Parse resolution
+    resolution = None
+    if width and height:
+        resolution = f"{width}x{height}"
+
+    # Parse codec
+    rep_mime = representation.get('mimeType') or adaptation_set.get('mimeType', '')
+    codec = parse_codec_string(codecs, rep_mime) if codecs else None
+
+    return BitrateInfo(
+        level=level,
+        bitrate=int(bandwidth) if bandwidth and bandwidth.isdigit() else 0,
+        resolution=resolution,
+        codec=codec,
+        frame_rate=parse_frame_rate(frame_rate),
+        audio_codec=None
+    )
+
+
+def parse_audio_adaptation_set(
+    adaptation_set: ET._Element,
+    representation: Optional[ET._Element],
+    namespaces: Dict[str, str]
+) -> AudioTrack:
+    """
+    Build audio track information for an audio AdaptationSet.
 
     Args:
-        root: MPD root element
+        adaptation_set: AdaptationSet element
+        representation: First Representation of the set, if any
         namespaces: XML namespaces
 
     Returns:
-        List of AudioTrack objects
+        AudioTrack object
     """
-    audio_tracks = []
-
-    # Find all audio adaptation sets
-    for period in root.findall('.//mpd:Period', namespaces):
-        for adaptation_set in period.findall('.//mpd:AdaptationSet', namespaces):
-            # Check if this is an audio adaptation set
-            content_type = adaptation_set.get('contentType', '')
-            mime_type = adaptation_set.get('mimeType', '')
-
-            is_audio = 'audio' in content_type or 'audio' in mime_type
-
-            # Also check representations
-            if not is_audio:
-                for rep in adaptation_set.findall('.//mpd:Representation', namespaces):
-                    rep_mime = rep.get('mimeType', mime_type)
-                    if 'audio' in rep_mime:
-                        is_audio = True
-                        break
-
-            if not is_audio:
-                continue
-
-            # Extract language
-            language = adaptation_set.get('lang', 'und')
+    # Extract language
+    language = adaptation_set.get('lang', 'und')
+
+    # Extract codec from first representation
+    codec = None
+    channels = None
+    bitrate = None
+
+    if representation is not None:
+        codecs = representation.get('codecs') or adaptation_set.get('codecs')
+        rep_mime = representation.get('mimeType') or adaptation_set.get('mimeType', '')
+        codec = parse_codec_string(codecs, rep_mime) if codecs else None
+
+        # Get audio configuration
+        audio_config = next(representation.iterfind(
+            f".//{{{namespaces['mpd']}}}AudioChannelConfiguration"
+        ), None)
+        if audio_config is not None:
+            value = audio_config.get('value')
+            if value and value.isdigit():
+                channels = int(value)
+
+        bandwidth = representation.get('bandwidth')
+        if bandwidth and bandwidth.isdigit():
+            bitrate = int(bandwidth)
+
+    return AudioTrack(
+        language=language,
+        name=parse_label(adaptation_set, namespaces),
+        codec=codec,
+        channels=channels,
+        bitrate=bitrate
+    )
+
+
+def parse_subtitle_adaptation_set(
+    adaptation_set: ET._Element,
+    namespaces: Dict[str, str]
+) -> SubtitleTrack:
+    """
+    Build subtitle track information for a text AdaptationSet.
 
-            # Extract codec from first representation
-            codec = None
-            channels = None
-            bitrate = None
+    Args:
+        adaptation_set: AdaptationSet element
+        namespaces: XML namespaces
 
-            representation = adaptation_set.find('.//mpd:Representation', namespaces)
-            if representation is not None:
-                codecs = representation.get('codecs') or adaptation_set.get('codecs')
-                rep_mime = representation.get('mimeType') or mime_type
-                codec = parse_codec_string(codecs, rep_mime) if codecs else None
+    Returns:
+        SubtitleTrack object
+    """
+    mime_type = adaptation_set.get('mimeType', '')
+
+    # Determine format from MIME type
+    format_type = None
+    if 'wvtt' in mime_type or 'vtt' in mime_type:
+        format_type = 'WebVTT'
+    elif 'ttml' in mime_type:
+        format_type = 'TTML'
+    elif 'stpp' in mime_type:
+        format_type = 'TTML'
+
+    return SubtitleTrack(
+        language=adaptation_set.get('lang', 'und'),
+        name=parse_label(adaptation_set, namespaces),
+        format=format_type,
+        forced=False  # DASH doesn't typically indicate forced subs
+    )
+
+
+def parse_thumbnail_representation(
+    representation: ET._Element,
+    adaptation_set: ET._Element
+) -> ThumbnailTrack:
+    """
+    Build thumbnail track information from an image Representation.
 
-                # Get audio configuration
-                audio_config = representation.find('.//mpd:AudioChannelConfiguration', namespaces)
-                if audio_config is not None:
-                    value = audio_config.get('value')
-                    if value:
-                        try:
-                            channels = int(value)
-                        except:
-                            pass
+    Args:
+        representation: First Representation of the image AdaptationSet
+        adaptation_set: Parent AdaptationSet element
 
-                bandwidth = representation.get('bandwidth')
-                if bandwidth:
-                    bitrate = int(bandwidth)
+    Returns:
+        ThumbnailTrack object
+    """
+    width = representation.get('width')
+    height = representation.get('height')
 
-            # Get track name from Label or other attributes
-            name = None
-            label = adaptation_set.find('.//mpd:Label', namespaces)
-            if label is not None and label.text:
-                name = label.text.strip()
+    resolution = None
+    if width and height:
+        resolution = f"{width}x{height}"
 
-            audio_tracks.append(AudioTrack(
-                language=language,
-                name=name,
-                codec=codec,
-                channels=channels,
-                bitrate=bitrate
-            ))
+    rep_mime = representation.get('mimeType') or adaptation_set.get('mimeType', '')
+    format_type = 'JPEG'
+    if 'png' in rep_mime.lower():
+        format_type = 'PNG'
 
-    return audio_tracks
+    return ThumbnailTrack(
+        resolution=resolution,
+        url=None,  # URL would be in BaseURL or SegmentTemplate
+        format=format_type
+    )
 
 
-def parse_subtitle_tracks(root: ET.Element, namespaces: Dict[str, str]) -> List[SubtitleTrack]:
+def parse_label(adaptation_set: ET._Element, namespaces: Dict[str, str]) -> Optional[str]:
     """
-    Extract subtitle track information from DASH manifest.
+    Get the track name from an AdaptationSet Label.
 
     Args:
-        root: MPD root element
+        adaptation_set: AdaptationSet element
         namespaces: XML namespaces
 
     Returns:
-        List of SubtitleTrack objects
+        Label text, or None if absent
     """
-    subtitle_tracks = []
-
-    # Find all text/subtitle adaptation sets
-    for period in root.findall('.//mpd:Period', namespaces):
-        for adaptation_set in period.findall('.//mpd:AdaptationSet', namespaces):
-            # Check if this is a text/subtitle adaptation set
-            content_type = adaptation_set.get('contentType', '')
-            mime_type = adaptation_set.get('mimeType', '')
-
-            is_subtitle = 'text' in content_type or 'application' in mime_type
-
-            if not is_subtitle:
-                continue
-
-            # Extract language
-            language = adaptation_set.get('lang', 'und')
-
-            # Determine format from MIME type
-            format_type = None
-            if 'wvtt' in mime_type or 'vtt' in mime_type:
-                format_type = 'WebVTT'
-            elif 'ttml' in mime_type:
-                format_type = 'TTML'
-            elif 'stpp' in mime_type:
-                format_type = 'TTML'
-
-            # Get track name
-            name = None
-            label = adaptation_set.find('.//mpd:Label', namespaces)
-            if label is not None and label.text:
-                name = label.text.strip()
-
-            subtitle_tracks.append(SubtitleTrack(
-                language=language,
-                name=name,
-                format=format_type,
-                forced=False  # DASH doesn't typically indicate forced subs
-            ))
-
-    return subtitle_tracks
+    labels = get_xpaths(namespaces['mpd'])['label'](adaptation_set)
+    if labels and labels[0].text:
+        return labels[0].text.strip()
+    return None
 
 
-def parse_thumbnail_tracks(root: ET.Element, namespaces: Dict[str, str]) -> List[ThumbnailTrack]:
+def parse_adaptation_sets(root: ET._Element, namespaces: Dict[str, str]) -> Dict[str, List]:
     """
-    Extract thumbnail track information from DASH manifest.
+    Extract bitrates, tracks and ContentProtection elements in one pass.
+
+    Each AdaptationSet is visited once and classified as video, audio,
+    text and/or image, instead of every track type re-walking the tree.
 
     Args:
         root: MPD root element
         namespaces: XML namespaces
 
     Returns:
-        List of ThumbnailTrack objects
+        Dictionary with 'bitrates', 'audio_tracks', 'subtitle_tracks',
+        'thumbnail_tracks' and 'content_protections' lists
     """
+    bitrates = []
+    audio_tracks = []
+    subtitle_tracks = []
     thumbnail_tracks = []
+    content_protections = []
+
+    xpaths = get_xpaths(namespaces['mpd'])
 
-    # Look for image adaptation sets
-    for period in root.findall('.//mpd:Period', namespaces):
-        for adaptation_set in period.findall('.//mpd:AdaptationSet', namespaces):
-            # Check if this is an image adaptation set
+    for period in xpaths['periods'](root):
+        for adaptation_set in xpaths['adaptation_sets'](period):
             content_type = adaptation_set.get('contentType', '')
             mime_type = adaptation_set.get('mimeType', '')
+            representations = xpaths['representations'](adaptation_set)
+            content_protections.extend(
+                xpaths['adaptation_set_content_protections'](adaptation_set)
+            )
+
+            # Representation MIME types decide untyped adaptation sets
+            rep_mimes = [rep.get('mimeType', mime_type) for rep in representations]
 
+            is_video = (
+                'video' in content_type or 'video' in mime_type or
+                any('video' in rep_mime for rep_mime in rep_mimes)
+            )
+            is_audio = (
+                'audio' in content_type or 'audio' in mime_type or
+                any('audio' in rep_mime for rep_mime in rep_mimes)
+            )
+            is_subtitle = 'text' in content_type or 'application' in mime_type
             is_image = 'image' in content_type or 'image' in mime_type
 
-            if not is_image:
-                continue
+            if is_video:
+                for representation in representations:
+                    bitrates.append(parse_video_representation(
+                        representation, adaptation_set, len(bitrates)
+                    ))
 
-            # Get first representation
-            representation = adaptation_set.find('.//mpd:Representation', namespaces)
-            if representation is not None:
-                width = representation.get('width')
-                height = representation.get('height')
+            first_representation = representations[0] if representations else None
 
-                resolution = None
-                if width and height:
-                    resolution = f"{width}x{height}"
+            if is_audio:
+                audio_tracks.append(parse_audio_adaptation_set(
+                    adaptation_set, first_representation, namespaces
+                ))
 
-                rep_mime = representation.get('mimeType') or mime_type
-                format_type = 'JPEG'
-                if 'png' in rep_mime.lower():
-                    format_type = 'PNG'
+            if is_subtitle:
+                subtitle_tracks.append(parse_subtitle_adaptation_set(adaptation_set, namespaces))
 
-                thumbnail_tracks.append(ThumbnailTrack(
-                    resolution=resolution,
-                    url=None,  # URL would be in BaseURL or SegmentTemplate
-                    format=format_type
+            if is_image and first_representation is not None:
+                thumbnail_tracks.append(parse_thumbnail_representation(
+                    first_representation, adaptation_set
                 ))
 
-    return thumbnail_tracks
+    return {
+        'bitrates': bitrates,
+        'audio_tracks': audio_tracks,
+        'subtitle_tracks': subtitle_tracks,
+        'thumbnail_tracks': thumbnail_tracks,
+        'content_protections': content_protections
+    }
+
+
+def parse_mpd_document(content: bytes) -> Dict:
+    """
+    Parse MPD bytes and extract all information.
+
+    Runs synchronously, so it is called from a worker thread.
+
+    Args:
+        content: Raw manifest bytes
 
+    Returns:
+        Dictionary containing parsed information
 
-async def parse_dash_manifest(url: str) -> Dict:
+    Raises:
+        ET.ParseError: If the manifest is not well-formed XML
+    """
+    root = ET.fromstring(content, get_xml_parser())
+    namespaces = get_namespace(root)
+
+    # Extract all information in a single pass over the adaptation sets
+    tracks = parse_adaptation_sets(root, namespaces)
+    drm_info = parse_drm_info(root, namespaces, tracks['content_protections'])
+
+    return {
+        'bitrates': tracks['bitrates'],
+        'audio_tracks': tracks['audio_tracks'],
+        'subtitle_tracks': tracks['subtitle_tracks'],
+        'thumbnail_tracks': tracks['thumbnail_tracks'],
+        'drm_info': drm_info,
+        'is_live': root.get('type') == 'dynamic',
+        'raw_xml': root,  # Include for SCTE-35 parsing
+        'namespaces': namespaces
+    }
+
+
+async def parse_dash_manifest(url: str, request_headers: Optional[Dict[str, str]] = None) -> Optional[Dict]:
     """
     Parse DASH manifest and extract all information.
 
     Args:
         url: URL of the DASH manifest
+        request_headers: Conditional request headers from an earlier parse
+            of the same URL (its 'request_headers' entry)
 
     Returns:
-        Dictionary containing parsed information
+        Dictionary containing parsed information, including the headers for
+        revalidating it under 'request_headers' (empty if the server sent
+        no validators), or None if the manifest is unchanged (304)
 
     Raises:
         HTTPException: If parsing fails
     """
     try:
-        # Fetch manifest content
-        content = await fetch_manifest(url)
-
-        # Parse XML
-        root = ET.fromstring(content)
-        namespaces = get_namespace(root)
-
-        # Extract all information
-        bitrates = parse_bitrates(root, namespaces)
-        audio_tracks = parse_audio_tracks(root, namespaces)
-        subtitle_tracks = parse_subtitle_tracks(root, namespaces)
-        thumbnail_tracks = parse_thumbnail_tracks(root, namespaces)
-        drm_info = parse_drm_info(root, namespaces)
-
-        return {
-            'bitrates': bitrates,
-            'audio_tracks': audio_tracks,
-            'subtitle_tracks': subtitle_tracks,
-            'thumbnail_tracks': thumbnail_tracks,
-            'drm_info': drm_info,
-            'raw_xml': root,  # Include for SCTE-35 parsing
-            'namespaces': namespaces
-        }
+        # Revalidate a previously analyzed manifest instead of re-downloading it
+        response = await fetch_manifest(url, request_headers)
+        if response.status_code == 304 and request_headers:
+            return None
+
+        # Parse the raw bytes off the event loop (lxml honours the XML
+        # encoding declaration and releases the GIL while parsing)
+        parsed = await asyncio.to_thread(parse_mpd_document, response.content)
+        parsed['request_headers'] = get_conditional_headers(response)
+
+        return parsed
 
     except HTTPException:
         raise
@@ -5,79 +5,248 @@ Uses PyAV (FFmpeg bindings) to analyze video fragments and extract
 detailed metadata about streams.
 """
 
+import asyncio
 import av
+import hashlib
 import httpx
-import tempfile
+import io
+import logging
 import os
-from typing import List, Dict, Optional
+import re
+import threading
+from typing import List, Dict, Optional, Union
+from lxml import etree as ET
 from pathlib import Path
 from urllib.parse import urljoin
 
 from models.schemas import VideoMetadata
+from services.cache import TTLCache
+from services.dash_parser import MPD_NAMESPACE, get_xpaths
+from services.http_client import get_http_client
+
+
+logger = logging.getLogger(__name__)
 
 
 # Timeout for fragment downloads
 FRAGMENT_TIMEOUT = 10.0
 # Maximum fragment size to download (50MB)
 MAX_FRAGMENT_SIZE = 50 * 1024 * 1024
+# Maximum bitrate levels downloaded/probed at once per analysis
+MAX_CONCURRENT_LEVELS = 8
+# Leading bytes of each fragment downloaded for probing (4MB); large enough
+# to hold a typical 2-6s segment whole so its duration is still measured
+FRAGMENT_PROBE_SIZE = 4 * 1024 * 1024
+# Read size when streaming fragment bodies
+FRAGMENT_CHUNK_SIZE = 64 * 1024
+# Number of HLS bitrate levels sampled for fragment analysis
+HLS_LEVELS_TO_ANALYZE = 3
 # Number of fragments to analyze per bitrate level
 FRAGMENTS_TO_ANALYZE = 2
-
-
-async def download_fragment(url: str, timeout: float = FRAGMENT_TIMEOUT) -> Optional[bytes]:
+# FFmpeg probing limits for fragment analysis
+PROBE_OPTIONS = {
+    'probesize': '32768',
+    'analyzeduration': '1000000',
+    'fflags': '+fastseek+nobuffer',
+}
+# DASH template identifier with optional printf width, e.g. $Number%05d$
+TEMPLATE_IDENTIFIER_RE = re.compile(r'\$(RepresentationID|Number|Bandwidth|Time|)(?:%0(\d+)d)?\$')
+# Leading bytes of a fragment scanned for MP4 encryption boxes
+ENCRYPTION_SCAN_SIZE = 64 * 1024
+# Common Encryption boxes found inside moov/moof (protection scheme info,
+# track encryption, sample encryption, protection system header)
+ENCRYPTION_BOX_TYPES = (b'sinf', b'tenc', b'senc', b'pssh')
+# FFmpeg error messages that point at encrypted content
+ENCRYPTION_ERROR_RE = re.compile(r'decrypt|encrypted|drm|protection|cenc', re.IGNORECASE)
+# Decoder threads per probed video stream
+DECODE_THREADS = min(4, os.cpu_count() or 1)
+# Analysis keys copied into VideoMetadata
+VIDEO_METADATA_FIELDS = frozenset(VideoMetadata.model_fields) - {'level'}
+# Number of fragment analyses kept, keyed by content digest
+FRAGMENT_CACHE_SIZE = 128
+# Time-to-live for cached fragment analyses (1 hour)
+FRAGMENT_CACHE_TTL = 3600.0
+
+# PyAV probe results keyed by (blake2b digest of the fragment bytes,
+# whether encryption was probed by decoding). Fragments are analyzed in
+# worker threads and TTLCache is not thread-safe, so every access holds
+# _fragment_analysis_lock
+_fragment_analysis_cache = TTLCache(maxsize=FRAGMENT_CACHE_SIZE, ttl=FRAGMENT_CACHE_TTL)
+_fragment_analysis_lock = threading.Lock()
+
+
+async def download_fragment(
+    url: str,
+    timeout: float = FRAGMENT_TIMEOUT,
+    client: Optional[httpx.AsyncClient] = None
+) -> Optional[tuple[bytes, Optional[int]]]:
     """
-    Download a video fragment from URL.
+    Download the leading part of a video fragment from URL.
+
+    Only the first FRAGMENT_PROBE_SIZE bytes are requested (and read, even
+    if the server ignores the Range header), which is enough for PyAV to
+    identify the streams.
 
     Args:
         url: Fragment URL
         timeout: Download timeout in seconds
+        client: HTTP client to use (defaults to the shared client)
 
     Returns:
-        Fragment bytes or None if download fails
+        Tuple of (fragment bytes, total fragment size or None if unknown)
+        or None if the download fails or the fragment is too large
     """
+    headers = {'Range': f'bytes=0-{FRAGMENT_PROBE_SIZE - 1}'}
+
     try:
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-            response = await client.get(url)
+        client = client or get_http_client()
+        async with client.stream(
+            'GET', url, headers=headers, timeout=timeout, follow_redirects=True
+        ) as response:
             response.raise_for_status()
 
             # Check size
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > MAX_FRAGMENT_SIZE:
-                print(f"Fragment too large: {content_length} bytes")
-                return None
-
-            content = response.content
-            if len(content) > MAX_FRAGMENT_SIZE:
-                print(f"Fragment too large: {len(content)} bytes")
+            total_size = get_fragment_size(response)
+            if total_size and total_size > MAX_FRAGMENT_SIZE:
+                logger.warning("Fragment too large: %s bytes", total_size)
                 return None
 
-            return content
+            chunks = []
+            received = 0
+            truncated = False
+            async for chunk in response.aiter_bytes(chunk_size=FRAGMENT_CHUNK_SIZE):
+                if received + len(chunk) > FRAGMENT_PROBE_SIZE:
+                    # Trim the last chunk rather than re-slicing the joined body
+                    chunks.append(chunk[:FRAGMENT_PROBE_SIZE - received])
+                    received = FRAGMENT_PROBE_SIZE
+                    truncated = True
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+
+        # Only a complete body tells us the size when the headers did not
+        if total_size is None and not truncated:
+            total_size = received
+        return b''.join(chunks), total_size
 
     except Exception as e:
-        print(f"Error downloading fragment from {url}: {e}")
+        logger.warning("Error downloading fragment from %s: %s", url, e)
         return None
 
 
-def analyze_fragment_with_pyav(fragment_data: bytes) -> Dict:
+def get_fragment_size(response: httpx.Response) -> Optional[int]:
+    """
+    Get the full size of a fragment from its response headers.
+
+    Args:
+        response: Fragment HTTP response (200 or 206)
+
+    Returns:
+        Total fragment size in bytes, or None if the server did not say
+    """
+    if response.status_code == 206:
+        # Content-Range: bytes 0-262143/1048576 (total may be '*')
+        total = response.headers.get('content-range', '').rpartition('/')[2]
+    else:
+        total = response.headers.get('content-length', '')
+
+    return int(total) if total.isdigit() else None
+
+
+def analyze_fragment_with_pyav(fragment_data: bytes, probe_encryption: bool = True) -> Dict:
     """
     Analyze video fragment using PyAV (FFmpeg).
 
-    Also detects DRM/encryption by attempting to decode the fragment.
+    Also detects DRM/encryption from MP4 encryption boxes or, failing that,
+    by attempting to decode the fragment. Results are cached by content
+    digest, so identical fragments are only probed once.
 
     Args:
         fragment_data: Fragment binary data
+        probe_encryption: Attempt a frame decode to detect encryption; pass
+            False when only stream metadata is needed
 
     Returns:
         Dictionary containing video metadata and encryption status
     """
-    # Write fragment to temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-        tmp_file.write(fragment_data)
-        tmp_path = tmp_file.name
+    digest = hashlib.blake2b(fragment_data, digest_size=16).digest()
+    cache_key = (digest, probe_encryption)
+    with _fragment_analysis_lock:
+        cached = _fragment_analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Probe outside the lock so concurrent fragments decode in parallel
+    metadata = probe_fragment_with_pyav(fragment_data, probe_encryption)
+    if metadata and 'error' not in metadata:
+        with _fragment_analysis_lock:
+            _fragment_analysis_cache.set(cache_key, metadata)
+    return metadata
+
+
+def has_encryption_boxes(fragment_data: bytes) -> bool:
+    """
+    Check ISOBMFF (MP4) headers for Common Encryption boxes.
+
+    Walks the top-level boxes of the first ENCRYPTION_SCAN_SIZE bytes and
+    looks for pssh/sinf/tenc/senc inside moov/moof (or a top-level pssh).
+    Media data is never scanned. Non-MP4 input (e.g. MPEG-TS) returns False.
+
+    Args:
+        fragment_data: Fragment binary data
+
+    Returns:
+        True if the headers declare encryption
+    """
+    data = memoryview(fragment_data)[:ENCRYPTION_SCAN_SIZE]
+    offset = 0
+
+    while offset + 8 <= len(data):
+        size = int.from_bytes(data[offset:offset + 4], 'big')
+        box_type = bytes(data[offset + 4:offset + 8])
+        header_size = 8
+        if size == 1 and offset + 16 <= len(data):
+            size = int.from_bytes(data[offset + 8:offset + 16], 'big')
+            header_size = 16
+        elif size == 0:
+            size = len(data) - offset  # box extends to end of file
+
+        if size < header_size or not box_type.isascii():
+            return False
+
+        if box_type == b'pssh':
+            return True
+        if box_type in (b'moov', b'moof'):
+            body = bytes(data[offset + header_size:offset + size])
+            if any(encryption_box in body for encryption_box in ENCRYPTION_BOX_TYPES):
+                return True
+
+        offset += size
+
+    return False
+
+
+def probe_fragment_with_pyav(fragment_data: bytes, probe_encryption: bool = True) -> Dict:
+    """
+    Probe a video fragment with PyAV, bypassing the analysis cache.
+
+    Args:
+        fragment_data: Fragment binary data
+        probe_encryption: Attempt a frame decode to detect encryption when
+            the MP4 headers do not declare it
 
+    Returns:
+        Dictionary containing video metadata and encryption status
+    """
+    container = None
     try:
-        # Open with PyAV
-        container = av.open(tmp_path)
+        # Open with PyAV straight from memory; probing is bounded because
+        # only codec/resolution metadata is needed, not full stream analysis
+        container = av.open(
+            io.BytesIO(fragment_data),
+            options=PROBE_OPTIONS,
+            metadata_errors='ignore'
+        )
 
         metadata = {
             'container_format': container.format.name,
@@ -88,12 +257,14 @@ def analyze_fragment_with_pyav(fragment_data: bytes) -> Dict:
         }
 
         # Find video stream
-        video_stream = None
-        for stream in container.streams.video:
-            video_stream = stream
-            break
+        video_stream = container.streams.video[0] if container.streams.video else None
 
         if video_stream:
+            # Slice threading must be set before the decoder opens; frame
+            # threading would delay the single frame we decode below
+            video_stream.thread_type = 'SLICE'
+            video_stream.thread_count = DECODE_THREADS
+
             # Extract video metadata
             metadata['video_codec'] = video_stream.codec_context.name
             metadata['codec_profile'] = video_stream.codec_context.profile if video_stream.codec_context.profile else None
@@ -106,7 +277,7 @@ def analyze_fragment_with_pyav(fragment_data: bytes) -> Dict:
             if video_stream.average_rate:
                 try:
                     metadata['frame_rate'] = float(video_stream.average_rate)
-                except:
+                except (ValueError, ZeroDivisionError):
                     pass
 
             # Bitrate
@@ -122,63 +293,61 @@ def analyze_fragment_with_pyav(fragment_data: bytes) -> Dict:
             if container.duration:
                 metadata['fragment_duration'] = container.duration / av.time_base
 
-            # Check for encryption by trying to decode a frame
-            try:
-                # Attempt to decode one frame
-                packet_count = 0
-                decoded_frame = False
-
-                for packet in container.demux(video_stream):
-                    packet_count += 1
-                    try:
-                        for frame in packet.decode():
-                            # Successfully decoded a frame
-                            decoded_frame = True
+            # Encryption boxes in the MP4 headers settle it without decoding;
+            # otherwise (unless only metadata is wanted) check for encryption
+            # by trying to decode a frame
+            if has_encryption_boxes(fragment_data):
+                metadata['is_encrypted'] = True
+                metadata['drm_detected'] = 'Unknown (encrypted)'
+            elif probe_encryption:
+                try:
+                    # Attempt to decode one frame
+                    packet_count = 0
+                    decoded_frame = False
+
+                    for packet in container.demux(video_stream):
+                        packet_count += 1
+                        try:
+                            for frame in packet.decode():
+                                # Successfully decoded a frame
+                                decoded_frame = True
+                                break
+                        except Exception as decode_error:
+                            # Decode error might indicate encryption
+                            if ENCRYPTION_ERROR_RE.search(str(decode_error)):
+                                metadata['is_encrypted'] = True
+                                metadata['drm_detected'] = 'Unknown (encrypted)'
                             break
-                    except Exception as decode_error:
-                        # Decode error might indicate encryption
-                        error_str = str(decode_error).lower()
-                        if any(term in error_str for term in ['decrypt', 'encrypted', 'drm', 'protection']):
-                            metadata['is_encrypted'] = True
-                            metadata['drm_detected'] = 'Unknown (encrypted)'
-                        break
-
-                    if decoded_frame or packet_count >= 5:
-                        break
-
-                # If we read packets but couldn't decode any frames, likely encrypted
-                if packet_count > 0 and not decoded_frame:
-                    metadata['is_encrypted'] = True
-                    metadata['drm_detected'] = 'Unknown (encrypted)'
-
-            except Exception as e:
-                # If we can't even read packets, check if it's encryption-related
-                error_str = str(e).lower()
-                if any(term in error_str for term in ['decrypt', 'encrypted', 'drm', 'protection', 'cenc']):
-                    metadata['is_encrypted'] = True
-                    metadata['drm_detected'] = 'Unknown (encrypted)'
+
+                        if decoded_frame or packet_count >= 5:
+                            break
+
+                    # If we read packets but couldn't decode any frames, likely encrypted
+                    if packet_count > 0 and not decoded_frame:
+                        metadata['is_encrypted'] = True
+                        metadata['drm_detected'] = 'Unknown (encrypted)'
+
+                except Exception as e:
+                    # If we can't even read packets, check if it's encryption-related
+                    if ENCRYPTION_ERROR_RE.search(str(e)):
+                        metadata['is_encrypted'] = True
+                        metadata['drm_detected'] = 'Unknown (encrypted)'
 
         # Find audio stream
-        audio_stream = None
-        for stream in container.streams.audio:
-            audio_stream = stream
-            break
+        audio_stream = container.streams.audio[0] if container.streams.audio else None
 
         if audio_stream:
             metadata['audio_codec'] = audio_stream.codec_context.name
             metadata['audio_channels'] = audio_stream.codec_context.channels
             metadata['audio_sample_rate'] = audio_stream.codec_context.sample_rate
 
-        container.close()
-
         return metadata
 
     except Exception as e:
-        error_str = str(e).lower()
-        print(f"Error analyzing fragment with PyAV: {e}")
+        logger.warning("Error analyzing fragment with PyAV: %s", e)
 
         # Check if error indicates encryption
-        if any(term in error_str for term in ['decrypt', 'encrypted', 'drm', 'protection', 'cenc']):
+        if ENCRYPTION_ERROR_RE.search(str(e)):
             return {
                 'is_encrypted': True,
                 'drm_detected': 'Unknown (encrypted)',
@@ -188,20 +357,27 @@ def analyze_fragment_with_pyav(fragment_data: bytes) -> Dict:
 
         return {}
     finally:
-        # Clean up temp file
-        try:
-            os.unlink(tmp_path)
-        except:
-            pass
+        # Release the demuxer (and its reference to the buffer) on every path
+        if container is not None:
+            container.close()
 
 
-def get_hls_fragment_urls(parsed_data: Dict, manifest_url: str) -> Dict[int, List[str]]:
+def get_hls_fragment_urls(
+    parsed_data: Dict,
+    manifest_url: str,
+    max_levels: int = HLS_LEVELS_TO_ANALYZE
+) -> Dict[int, List[str]]:
     """
     Extract fragment URLs from HLS parsed data.
 
+    Only a sample of the bitrate ladder (lowest, median and highest
+    bandwidth by default) is returned, so the work stays bounded however
+    many variants the manifest lists.
+
     Args:
         parsed_data: Parsed HLS manifest data
         manifest_url: The manifest URL to resolve relative URLs
+        max_levels: Maximum number of bitrate levels to return
 
     Returns:
         Dictionary mapping bitrate level to list of fragment URLs
@@ -212,80 +388,332 @@ def get_hls_fragment_urls(parsed_data: Dict, manifest_url: str) -> Dict[int, Lis
     if not playlist or not playlist.playlists:
         return fragment_urls
 
-    # For each bitrate level, get segment URLs
-    for idx, variant in enumerate(playlist.playlists):
-        if variant.uri:
-            # This is a variant playlist - we'd need to fetch it to get actual segments
-            # Convert relative URL to absolute URL
-            absolute_url = urljoin(manifest_url, variant.uri)
-            fragment_urls[idx] = [absolute_url]
+    # Sample levels evenly across the ladder ordered by bandwidth, keeping
+    # the original indices so levels line up with the parsed bitrates
+    levels = [(idx, variant) for idx, variant in enumerate(playlist.playlists) if variant.uri]
+    levels.sort(key=lambda level: level[1].stream_info.bandwidth or 0)
+    if len(levels) > max_levels:
+        last = len(levels) - 1
+        if max_levels > 1:
+            picks = {round(i * last / (max_levels - 1)) for i in range(max_levels)}
+        else:
+            picks = {0}
+        levels = [levels[pick] for pick in sorted(picks)]
+
+    # For each sampled bitrate level, get segment URLs
+    for idx, variant in sorted(levels, key=lambda level: level[0]):
+        # This is a variant playlist - we'd need to fetch it to get actual segments
+        # Convert relative URL to absolute URL
+        absolute_url = urljoin(manifest_url, variant.uri)
+        fragment_urls[idx] = [absolute_url]
 
     return fragment_urls
 
 
-def get_dash_fragment_urls(parsed_data: Dict, manifest_url: str) -> Dict[int, List[str]]:
+def expand_segment_template(template: str, values: Dict[str, Union[int, str]]) -> str:
+    """
+    Substitute DASH template identifiers ($Number$, $Time$, ...).
+
+    Args:
+        template: SegmentTemplate media or initialization attribute
+        values: Identifier values keyed by name (RepresentationID,
+            Bandwidth, Number, Time)
+
+    Returns:
+        Expanded URL, resolved in a single pass
+    """
+    def substitute(match: re.Match) -> str:
+        name, width = match.group(1), match.group(2)
+        if not name:
+            return '$'  # $$ escapes a literal dollar sign
+        value = str(values.get(name, ''))
+        if width and value.isdigit():
+            return value.zfill(int(width))
+        return value
+
+    return TEMPLATE_IDENTIFIER_RE.sub(substitute, template)
+
+
+def get_segment_timeline_times(timeline: List[ET._Element], limit: int) -> List[int]:
+    """
+    Compute start times of the first segments in a SegmentTimeline.
+
+    Args:
+        timeline: SegmentTimeline S elements
+        limit: Maximum number of start times to return
+
+    Returns:
+        Segment start times in timescale units
+    """
+    times = []
+    current = 0
+
+    for segment in timeline:
+        start = segment.get('t')
+        if start and start.isdigit():
+            current = int(start)
+        duration = segment.get('d', '')
+        duration = int(duration) if duration.isdigit() else 0
+        repeat = segment.get('r', '0')
+        repeat = int(repeat) if repeat.lstrip('-').isdigit() else 0
+
+        # r="-1" repeats until the next S element or the period end
+        count = limit if repeat < 0 else repeat + 1
+        for _ in range(count):
+            times.append(current)
+            if len(times) >= limit:
+                return times
+            current += duration
+
+    return times
+
+
+def resolve_segment_urls(
+    base_url: str,
+    representation: ET._Element,
+    segment_templates: List[ET._Element],
+    segment_lists: List[ET._Element],
+    xpaths: Dict[str, ET.XPath]
+) -> tuple[Optional[str], List[str]]:
+    """
+    Resolve the initialization and first media segment URLs of a Representation.
+
+    Args:
+        base_url: Absolute BaseURL for the Representation
+        representation: Representation element
+        segment_templates: SegmentTemplate elements from the Representation,
+            AdaptationSet and Period, nearest first (attributes inherit)
+        segment_lists: SegmentList elements, nearest first
+        xpaths: Compiled DASH XPath lookups
+
+    Returns:
+        Tuple of (initialization URL or None, media segment URLs). A plain
+        BaseURL (SegmentBase / single file) is returned as the only media URL.
+    """
+    def inherited(name: str, default: Optional[str] = None) -> Optional[str]:
+        for template in segment_templates:
+            value = template.get(name)
+            if value is not None:
+                return value
+        return default
+
+    media = inherited('media')
+    if media:
+        values = {
+            'RepresentationID': representation.get('id', ''),
+            'Bandwidth': representation.get('bandwidth', ''),
+        }
+        start_number = inherited('startNumber', '1')
+        start_number = int(start_number) if start_number.isdigit() else 1
+
+        timeline = []
+        for template in segment_templates:
+            timeline = xpaths['segment_timeline'](template)
+            if timeline:
+                break
+
+        if timeline:
+            segment_values = [
+                {**values, 'Number': start_number + index, 'Time': time}
+                for index, time in enumerate(get_segment_timeline_times(timeline, FRAGMENTS_TO_ANALYZE))
+            ]
+        else:
+            segment_values = [
+                {**values, 'Number': start_number + index}
+                for index in range(FRAGMENTS_TO_ANALYZE)
+            ]
+
+        media_urls = [
+            urljoin(base_url, expand_segment_template(media, segment))
+            for segment in segment_values
+        ]
+
+        initialization = inherited('initialization')
+        init_url = urljoin(base_url, expand_segment_template(initialization, values)) if initialization else None
+        return init_url, media_urls
+
+    if segment_lists:
+        segment_list = segment_lists[0]
+        media_urls = [
+            urljoin(base_url, segment_url.get('media'))
+            for segment_url in xpaths['segment_urls'](segment_list)[:FRAGMENTS_TO_ANALYZE]
+            if segment_url.get('media')
+        ]
+        initialization = xpaths['initialization'](segment_list)
+        source_url = initialization[0].get('sourceURL') if initialization else None
+        init_url = urljoin(base_url, source_url) if source_url else None
+        if media_urls:
+            return init_url, media_urls
+
+    return None, [base_url] if has_base_url(representation, xpaths) else []
+
+
+def has_base_url(element: ET._Element, xpaths: Dict[str, ET.XPath]) -> bool:
+    """Check whether an element carries its own non-empty BaseURL."""
+    return any(base.text and base.text.strip() for base in xpaths['base_url'](element))
+
+
+def join_base_url(base_url: str, element: ET._Element, xpaths: Dict[str, ET.XPath]) -> str:
+    """
+    Apply an element's BaseURL (if any) to the inherited base URL.
+
+    Args:
+        base_url: Absolute base URL inherited from the parent element
+        element: MPD, Period, AdaptationSet or Representation element
+        xpaths: Compiled DASH XPath lookups
+
+    Returns:
+        Absolute base URL for the element
+    """
+    for base in xpaths['base_url'](element):
+        if base.text and base.text.strip():
+            return urljoin(base_url, base.text.strip())
+    return base_url
+
+
+def get_dash_fragment_urls(parsed_data: Dict, manifest_url: str) -> tuple[Dict[int, List[str]], Dict[int, str]]:
     """
     Extract fragment URLs from DASH parsed data.
 
+    Handles SegmentTemplate (with or without SegmentTimeline), SegmentList
+    and plain BaseURL addressing, with BaseURL and template attributes
+    inherited from the MPD, Period and AdaptationSet.
+
     Args:
         parsed_data: Parsed DASH manifest data
         manifest_url: The manifest URL to resolve relative URLs
 
     Returns:
-        Dictionary mapping bitrate level to list of fragment URLs
+        Tuple of (dictionary mapping bitrate level to list of fragment URLs,
+        dictionary mapping bitrate level to its initialization segment URL)
     """
     fragment_urls = {}
+    init_urls = {}
     root = parsed_data.get('raw_xml')
     namespaces = parsed_data.get('namespaces', {})
 
     if root is None:
-        return fragment_urls
-
-    level = 0
-
-    # Find video representations and their segments
-    for period in root.findall('.//mpd:Period', namespaces):
-        for adaptation_set in period.findall('.//mpd:AdaptationSet', namespaces):
-            # Check if video
-            content_type = adaptation_set.get('contentType', '')
-            mime_type = adaptation_set.get('mimeType', '')
-            is_video = 'video' in content_type or 'video' in mime_type
-
-            if not is_video:
-                for rep in adaptation_set.findall('.//mpd:Representation', namespaces):
-                    rep_mime = rep.get('mimeType', mime_type)
-                    if 'video' in rep_mime:
-                        is_video = True
-                        break
-
-            if not is_video:
-                continue
-
-            # Extract segment URLs from each representation
-            for representation in adaptation_set.findall('.//mpd:Representation', namespaces):
-                urls = []
+        return fragment_urls, init_urls
+
+    xpaths = get_xpaths(namespaces.get('mpd', MPD_NAMESPACE))
+    mpd_base_url = join_base_url(manifest_url, root, xpaths)
+    period = None
+    adaptation_set = None
+
+    # Select every video representation with one XPath query. Document order
+    # matches parse_adaptation_sets, so levels line up with the parsed
+    # bitrates; inherited Period/AdaptationSet context is recomputed only
+    # when the parent changes
+    for level, representation in enumerate(xpaths['video_representations'](root)):
+        if representation.getparent() is not adaptation_set:
+            adaptation_set = representation.getparent()
+            if adaptation_set.getparent() is not period:
+                period = adaptation_set.getparent()
+                period_base_url = join_base_url(mpd_base_url, period, xpaths)
+                period_templates = xpaths['segment_template'](period)
+                period_lists = xpaths['segment_list'](period)
+
+            set_base_url = join_base_url(period_base_url, adaptation_set, xpaths)
+            set_templates = xpaths['segment_template'](adaptation_set) + period_templates
+            set_lists = xpaths['segment_list'](adaptation_set) + period_lists
+
+        # Extract segment URLs from the representation
+        init_url, urls = resolve_segment_urls(
+            join_base_url(set_base_url, representation, xpaths),
+            representation,
+            xpaths['segment_template'](representation) + set_templates,
+            xpaths['segment_list'](representation) + set_lists,
+            xpaths
+        )
+
+        if urls:
+            fragment_urls[level] = urls[:FRAGMENTS_TO_ANALYZE]
+            if init_url:
+                init_urls[level] = init_url
+
+    return fragment_urls, init_urls
+
+
+async def analyze_level_fragments(
+    urls: List[str],
+    init_url: Optional[str] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    probe_encryption: bool = True
+) -> Optional[Dict]:
+    """
+    Download and analyze fragments for a single bitrate level.
 
-                # Look for BaseURL
-                base_url_elem = representation.find('.//mpd:BaseURL', namespaces)
-                if base_url_elem is not None and base_url_elem.text:
-                    relative_url = base_url_elem.text.strip()
-                    # Convert relative URL to absolute URL
-                    absolute_url = urljoin(manifest_url, relative_url)
-                    urls.append(absolute_url)
+    Fragments are tried in order until one yields a result. PyAV probing
+    runs in a worker thread so other levels can download meanwhile.
 
-                # Look for SegmentTemplate or SegmentList
-                # This would require more complex URL construction
-                # For now, just use BaseURL if available
+    Args:
+        urls: Fragment URLs for the level
+        init_url: Initialization segment URL, prepended to each fragment so
+            fragmented MP4 media segments can be demuxed
+        client: HTTP client to download with (defaults to the shared client)
+        probe_encryption: Attempt a frame decode to detect encryption
 
-                if urls:
-                    fragment_urls[level] = urls[:FRAGMENTS_TO_ANALYZE]
+    Returns:
+        Analysis of the first usable fragment, or None
+    """
+    init_data = b''
+    if init_url:
+        init_download = await download_fragment(init_url, client=client)
+        if not init_download:
+            return None
+        init_data = init_download[0]
+
+    for url in urls[:FRAGMENTS_TO_ANALYZE]:
+        download = await download_fragment(url, client=client)
+
+        if download:
+            fragment_data, total_size = download
+            fragment_data = init_data + fragment_data
+            analysis = await asyncio.to_thread(
+                analyze_fragment_with_pyav, fragment_data, probe_encryption
+            )
+
+            # Only analyze one fragment per level for now
+            if analysis:
+                # Report the full fragment size, not just the probed prefix
+                return {**analysis, 'file_size': total_size}
+
+    return None
+
+
+def get_fragment_urls(
+    parsed_data: Dict,
+    manifest_type: str,
+    manifest_url: str = ''
+) -> tuple[Dict[int, List[str]], Dict[int, str]]:
+    """
+    Extract the fragment URLs to analyze from parsed manifest data.
 
-                level += 1
+    Args:
+        parsed_data: Parsed manifest data
+        manifest_type: Type of manifest ('hls' or 'dash')
+        manifest_url: The manifest URL to resolve relative URLs
 
-    return fragment_urls
+    Returns:
+        Tuple of (fragment URLs by level, initialization segment URL by level),
+        both empty if the manifest data cannot be read
+    """
+    try:
+        if manifest_type == 'hls':
+            return get_hls_fragment_urls(parsed_data, manifest_url), {}
+        return get_dash_fragment_urls(parsed_data, manifest_url)
+    except Exception as e:
+        logger.exception("Error extracting fragment URLs: %s", e)
+        return {}, {}
 
 
-async def analyze_video_fragments(parsed_data: Dict, manifest_type: str, manifest_url: str = '') -> tuple[List[VideoMetadata], Optional[Dict]]:
+async def analyze_video_fragments(
+    parsed_data: Dict,
+    manifest_type: str,
+    manifest_url: str = '',
+    probe_encryption: bool = True,
+    fragment_urls: Optional[tuple[Dict[int, List[str]], Dict[int, str]]] = None
+) -> tuple[List[VideoMetadata], Optional[Dict]]:
     """
     Analyze video fragments using FFmpeg.
 
@@ -293,6 +721,11 @@ async def analyze_video_fragments(parsed_data: Dict, manifest_type: str, manifes
         parsed_data: Parsed manifest data
         manifest_type: Type of manifest ('hls' or 'dash')
         manifest_url: The manifest URL to resolve relative URLs
+        probe_encryption: Attempt a frame decode to detect encryption; pass
+            False for a metadata-only analysis (MP4 encryption boxes are
+            still checked)
+        fragment_urls: Result of get_fragment_urls, when already extracted
+            (parsed_data is then not read)
 
     Returns:
         Tuple of (List of VideoMetadata objects, DRM info dict or None)
@@ -301,49 +734,47 @@ async def analyze_video_fragments(parsed_data: Dict, manifest_type: str, manifes
     drm_info = None
 
     try:
-        # Get fragment URLs based on manifest type
-        if manifest_type == 'hls':
-            fragment_urls = get_hls_fragment_urls(parsed_data, manifest_url)
-        else:
-            fragment_urls = get_dash_fragment_urls(parsed_data, manifest_url)
-
-        # Analyze fragments for each bitrate level
-        for level, urls in fragment_urls.items():
-            for url in urls[:FRAGMENTS_TO_ANALYZE]:
-                # Download fragment
-                fragment_data = await download_fragment(url)
-
-                if fragment_data:
-                    # Analyze with PyAV
-                    analysis = analyze_fragment_with_pyav(fragment_data)
-
-                    if analysis:
-                        # Check if DRM was detected in fragment
-                        if analysis.get('is_encrypted') and not drm_info:
-                            drm_info = {
-                                'system': analysis.get('drm_detected', 'Unknown'),
-                                'detected_by': 'ffmpeg'
-                            }
-
-                        # Create VideoMetadata object
-                        metadata = VideoMetadata(
-                            level=level,
-                            container_format=analysis.get('container_format'),
-                            video_codec=analysis.get('video_codec'),
-                            codec_profile=analysis.get('codec_profile'),
-                            resolution=analysis.get('resolution'),
-                            frame_rate=analysis.get('frame_rate'),
-                            bitrate=analysis.get('bitrate'),
-                            color_space=analysis.get('color_space'),
-                            fragment_duration=analysis.get('fragment_duration'),
-                            file_size=analysis.get('file_size')
-                        )
-                        metadata_list.append(metadata)
-
-                        # Only analyze one fragment per level for now
-                        break
+        if fragment_urls is None:
+            fragment_urls = get_fragment_urls(parsed_data, manifest_type, manifest_url)
+        fragment_urls, init_urls = fragment_urls
+
+        # Download and probe bitrate levels concurrently over one pooled
+        # client, a bounded number at a time so the origin is not stampeded;
+        # results come back in level order so DRM detection stays deterministic
+        client = get_http_client()
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_LEVELS)
+
+        async def analyze_level(level: int, urls: List[str]) -> Optional[Dict]:
+            async with semaphore:
+                return await analyze_level_fragments(
+                    urls, init_urls.get(level), client, probe_encryption
+                )
+
+        levels = list(fragment_urls.items())
+        analyses = await asyncio.gather(*(
+            analyze_level(level, urls) for level, urls in levels
+        ))
+
+        for (level, _), analysis in zip(levels, analyses):
+            if not analysis:
+                continue
+
+            # Check if DRM was detected in fragment
+            if analysis.get('is_encrypted') and not drm_info:
+                drm_info = {
+                    'system': analysis.get('drm_detected', 'Unknown'),
+                    'detected_by': 'ffmpeg'
+                }
+
+            # Create VideoMetadata object from the analysis fields it models
+            # (encryption flags and audio details stay out)
+            metadata = VideoMetadata(level=level, **{
+                key: value for key, value in analysis.items()
+                if key in VIDEO_METADATA_FIELDS
+            })
+            metadata_list.append(metadata)
 
     except Exception as e:
-        print(f"Error analyzing video fragments: {e}")
+        logger.exception("Error analyzing video fragments: %s", e)
 
     return metadata_list, drm_info
@@ -14,6 +14,8 @@ from models.schemas import (
     BitrateInfo, AudioTrack, SubtitleTrack,
     ThumbnailTrack, DRMInfo
 )
+from services.http_client import get_limited
+from services.cache import get_conditional_headers
 
 
 # Timeout for manifest downloads (30 seconds)
@@ -21,42 +23,50 @@ MANIFEST_TIMEOUT = 30.0
 # Maximum manifest size (10MB)
 MAX_MANIFEST_SIZE = 10 * 1024 * 1024
 
-
-async def fetch_manifest(url: str) -> str:
+# Human-readable codec names keyed by RFC 6381 codec prefix (3 or 4 chars)
+VIDEO_CODEC_PREFIXES = {
+    'avc': 'H.264',
+    'hvc': 'H.265',
+    'hev': 'H.265',
+    'vp09': 'VP9',
+    'av01': 'AV1',
+}
+AUDIO_CODEC_PREFIXES = {
+    'mp4a': 'AAC',
+    'ac-3': 'AC3',
+    'ec-3': 'EAC3',
+}
+
+
+async def fetch_manifest(url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
     """
     Fetch manifest content from URL with timeout and size limits.
 
     Args:
         url: Manifest URL to fetch
+        headers: Extra request headers (e.g. conditional If-None-Match)
 
     Returns:
-        Manifest content as string
+        The HTTP response; status 304 when conditional headers matched
 
     Raises:
         HTTPException: If fetch fails or exceeds limits
     """
     try:
-        async with httpx.AsyncClient(timeout=MANIFEST_TIMEOUT) as client:
-            response = await client.get(url, follow_redirects=True)
-            response.raise_for_status()
-
-            # Check content size
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > MAX_MANIFEST_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Manifest size exceeds maximum of {MAX_MANIFEST_SIZE} bytes"
-                )
-
-            content = response.text
-            if len(content) > MAX_MANIFEST_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Manifest size exceeds maximum of {MAX_MANIFEST_SIZE} bytes"
-                )
+        # Stream the body so oversized manifests are never fully buffered
+        response = await get_limited(
+            url, MAX_MANIFEST_SIZE, headers=headers, timeout=MANIFEST_TIMEOUT
+        )
+        if response is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Manifest size exceeds maximum of {MAX_MANIFEST_SIZE} bytes"
+            )
 
-            return content
+        return response
 
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
         raise HTTPException(
             status_code=504,
@@ -139,36 +149,18 @@ def parse_bitrates(playlist: m3u8.M3U8) -> List[BitrateInfo]:
             width, height = stream_info.resolution
             resolution = f"{width}x{height}"
 
-        # Extract codec
+        # Extract video and audio codecs from one split of the codecs string
         codec = None
-        if stream_info.codecs:
-            # Parse video codec from codecs string
-            codecs_list = stream_info.codecs.split(',')
-            for c in codecs_list:
-                c = c.strip()
-                if c.startswith('avc') or c.startswith('hvc') or c.startswith('vp'):
-                    if c.startswith('avc'):
-                        codec = 'H.264'
-                    elif c.startswith('hvc') or c.startswith('hev'):
-                        codec = 'H.265'
-                    elif c.startswith('vp09'):
-                        codec = 'VP9'
-                    elif c.startswith('av01'):
-                        codec = 'AV1'
-                    break
-
-        # Extract audio codec
         audio_codec = None
         if stream_info.codecs:
-            codecs_list = stream_info.codecs.split(',')
-            for c in codecs_list:
-                c = c.strip()
-                if c.startswith('mp4a'):
-                    audio_codec = 'AAC'
-                elif c.startswith('ac-3'):
-                    audio_codec = 'AC3'
-                elif c.startswith('ec-3'):
-                    audio_codec = 'EAC3'
+            for c in stream_info.codecs.split(','):
+                prefix = c.strip()[:4].lower()
+                if codec is None:
+                    codec = VIDEO_CODEC_PREFIXES.get(prefix) or VIDEO_CODEC_PREFIXES.get(prefix[:3])
+                if audio_codec is None:
+                    audio_codec = AUDIO_CODEC_PREFIXES.get(prefix)
+                if codec and audio_codec:
+                    break
 
         bitrates.append(BitrateInfo(
             level=idx,
@@ -283,25 +275,31 @@ def parse_thumbnail_tracks(playlist: m3u8.M3U8) -> List[ThumbnailTrack]:
     return thumbnail_tracks
 
 
-async def parse_hls_manifest(url: str) -> Dict:
+async def parse_hls_manifest(url: str, request_headers: Optional[Dict[str, str]] = None) -> Optional[Dict]:
     """
     Parse HLS manifest and extract all information.
 
     Args:
         url: URL of the HLS manifest
+        request_headers: Conditional request headers from an earlier parse
+            of the same URL (its 'request_headers' entry)
 
     Returns:
-        Dictionary containing parsed information
+        Dictionary containing parsed information, including the headers for
+        revalidating it under 'request_headers' (empty if the server sent
+        no validators), or None if the manifest is unchanged (304)
 
     Raises:
         HTTPException: If parsing fails
     """
     try:
-        # Fetch manifest content
-        content = await fetch_manifest(url)
+        # Revalidate a previously analyzed manifest instead of re-downloading it
+        response = await fetch_manifest(url, request_headers)
+        if response.status_code == 304 and request_headers:
+            return None
 
         # Parse with m3u8 library
-        playlist = m3u8.loads(content)
+        playlist = m3u8.loads(response.text)
 
         # Extract all information
         bitrates = parse_bitrates(playlist)
@@ -316,7 +314,10 @@ async def parse_hls_manifest(url: str) -> Dict:
             'subtitle_tracks': subtitle_tracks,
             'thumbnail_tracks': thumbnail_tracks,
             'drm_info': drm_info,
-            'raw_playlist': playlist  # Include for SCTE-35 parsing
+            # Media playlists without EXT-X-ENDLIST are still being updated
+            'is_live': bool(playlist.segments) and not playlist.is_endlist,
+            'raw_playlist': playlist,  # Include for SCTE-35 parsing
+            'request_headers': get_conditional_headers(response)
         }
 
     except HTTPException:
@@ -0,0 +1,123 @@
+"""
+Shared HTTP client service.
+
+Provides a single pooled httpx.AsyncClient (HTTP/2, keep-alive) so manifest
+and fragment downloads reuse connections instead of opening a new TCP/TLS
+session per request.
+"""
+
+import asyncio
+from typing import Dict, Optional
+
+import httpx
+
+
+# Default timeout for outbound requests (callers may override per request)
+DEFAULT_TIMEOUT = 30.0
+# Idle keep-alive connections are held this long (httpx defaults to 5s), so
+# analyses a user runs back to back reuse warm CDN connections
+KEEPALIVE_EXPIRY = 60.0
+# Connection pool limits shared by all outbound requests
+POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=50,
+    keepalive_expiry=KEEPALIVE_EXPIRY
+)
+# Read size when streaming size-limited response bodies
+BODY_CHUNK_SIZE = 64 * 1024
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client, creating it on first use.
+
+    Pooled connections belong to the event loop that opened them, so a new
+    client is created if called from a different loop.
+
+    Returns:
+        Shared httpx.AsyncClient
+    """
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=True,
+            limits=POOL_LIMITS,
+            timeout=DEFAULT_TIMEOUT,
+        )
+        _client_loop = loop
+
+    return _client
+
+
+async def get_limited(
+    url: str,
+    max_size: int,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = DEFAULT_TIMEOUT
+) -> Optional[httpx.Response]:
+    """
+    GET a URL with the shared client, streaming the body under a size cap.
+
+    The body is read in BODY_CHUNK_SIZE chunks and the download is aborted
+    as soon as it exceeds max_size, so oversized responses are never fully
+    buffered. Status errors are raised as httpx.HTTPStatusError.
+
+    Args:
+        url: URL to fetch
+        max_size: Maximum body size in bytes (after content decoding)
+        headers: Extra request headers
+        timeout: Request timeout in seconds
+
+    Returns:
+        A fully read response (304 responses are returned as-is), or None
+        if the body is larger than max_size
+    """
+    client = get_http_client()
+    async with client.stream(
+        'GET', url, headers=headers, timeout=timeout, follow_redirects=True
+    ) as response:
+        if response.status_code == 304:
+            return response
+        response.raise_for_status()
+
+        # Reject early when the server announces an oversized body
+        content_length = response.headers.get('content-length', '')
+        if content_length.isdigit() and int(content_length) > max_size:
+            return None
+
+        chunks = []
+        received = 0
+        async for chunk in response.aiter_bytes(chunk_size=BODY_CHUNK_SIZE):
+            received += len(chunk)
+            if received > max_size:
+                return None
+            chunks.append(chunk)
+
+    # Rebuild a read response around the decoded body; the transfer
+    # encoding headers no longer describe it
+    response_headers = [
+        (name, value) for name, value in response.headers.multi_items()
+        if name not in ('content-encoding', 'content-length', 'transfer-encoding')
+    ]
+    return httpx.Response(
+        response.status_code,
+        headers=response_headers,
+        content=b''.join(chunks),
+        request=response.request
+    )
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and release pooled connections."""
+    global _client, _client_loop
+
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+
+    _client = None
+    _client_loop = None
@@ -4,9 +4,20 @@ SCTE-35 parser service.
 Extracts and parses SCTE-35 markers from HLS and DASH manifests.
 """
 
-import base64
-from typing import List, Dict, Any
-from xml.etree import ElementTree as ET
+import asyncio
+import itertools
+import logging
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+from lxml import etree as ET
+
+try:
+    # SIMD-accelerated drop-in for base64.b64decode
+    from pybase64 import b64decode
+except ImportError:
+    from base64 import b64decode
 
 try:
     import threefive
@@ -15,104 +26,253 @@ except ImportError:
     THREEFIVE_AVAILABLE = False
 
 from models.schemas import SCTE35Marker
+from services.dash_parser import MPD_NAMESPACE
+
+
+logger = logging.getLogger(__name__)
+
+
+# Number of distinct cues whose parse results are memoized (repeated
+# CUE-OUT/DATERANGE signals reuse the same payload across segments)
+SCTE35_CACHE_SIZE = 1024
+
+# SCTE-35 EventStream scheme URIs (urn:scte:scte35:2013:bin,
+# urn:scte:scte35:2014:xml+bin, ...), capturing the payload variant
+SCTE35_SCHEME_RE = re.compile(r'urn:scte:scte35:\d{4}:(xml\+bin|bin|xml)\Z')
+# SCTE-35 XML namespace used by Signal/Binary elements in DASH events
+SCTE35_NAMESPACE = 'http://www.scte.org/schemas/35/2016'
+
+# XPath expressions for SCTE-35 events in an MPD (relative to the root,
+# an EventStream and an Event respectively)
+SCTE35_XPATH_EXPRESSIONS = {
+    'event_streams': './mpd:Period/mpd:EventStream',
+    'events': './mpd:Event',
+    'binary': './scte35:Signal/scte35:Binary/text()',
+}
+
+# DATERANGE attributes that may carry a cue, in order of preference
+DATERANGE_SCTE35_ATTRS = operator.attrgetter('scte35_cmd', 'scte35_out', 'scte35_in')
 
+# Splice command names by splice_command_type
+SPLICE_COMMAND_TYPES = {
+    0x00: 'splice_null',
+    0x04: 'splice_schedule',
+    0x05: 'splice_insert',
+    0x06: 'time_signal',
+    0x07: 'bandwidth_reservation',
+    0xff: 'private_command',
+}
+# MPEG system clock rate used for splice PTS values (90kHz)
+PTS_CLOCK_RATE = 90000
 
-def parse_scte35_data(scte35_data: str, encoding: str = 'base64') -> Dict[str, Any]:
+
+@lru_cache(maxsize=8)
+def get_scte35_xpaths(mpd_namespace: str, scte35_namespace: str) -> Dict[str, ET.XPath]:
+    """
+    Compile the SCTE-35 XPath expressions for a pair of namespaces.
+
+    Args:
+        mpd_namespace: Namespace URI bound to the 'mpd' prefix
+        scte35_namespace: Namespace URI bound to the 'scte35' prefix
+
+    Returns:
+        Dictionary of expression name to compiled XPath
+    """
+    namespaces = {'mpd': mpd_namespace, 'scte35': scte35_namespace}
+    # Text results are plain str rather than lxml "smart strings" that
+    # keep a reference back to their parent element
+    return {
+        name: ET.XPath(expression, namespaces=namespaces, smart_strings=False)
+        for name, expression in SCTE35_XPATH_EXPRESSIONS.items()
+    }
+
+
+# Compile the expressions for the standard namespaces at import
+get_scte35_xpaths(MPD_NAMESPACE, SCTE35_NAMESPACE)
+
+
+class ParsedCue(NamedTuple):
+    """Marker fields decoded from a SCTE-35 cue."""
+    command_type: str
+    event_id: Optional[int]
+    pts: Optional[int]
+    duration: Optional[float]
+    upid: Optional[str]
+    segmentation_type: Optional[str]
+    out_of_network: bool
+    auto_return: bool
+
+
+def parse_event_id(event_id: Any) -> Optional[int]:
+    """
+    Convert a cue or manifest event ID to an integer.
+
+    Args:
+        event_id: Integer, decimal string or hex string ('0x4800008e')
+
+    Returns:
+        Event ID, or None if missing or not numeric
+    """
+    if isinstance(event_id, int) or event_id is None:
+        return event_id
+    try:
+        return int(event_id, 0)
+    except (TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=SCTE35_CACHE_SIZE)
+def parse_scte35_data(scte35_data: str, encoding: str = 'base64') -> Optional[ParsedCue]:
     """
     Parse SCTE-35 binary data using threefive library.
 
+    Values are normalized to the SCTE35Marker field types (command name,
+    integer event ID, PTS in 90kHz ticks). Results are memoized per
+    (scte35_data, encoding).
+
     Args:
         scte35_data: SCTE-35 data (base64 or hex encoded)
         encoding: Encoding type ('base64' or 'hex')
 
     Returns:
-        Dictionary containing parsed SCTE-35 information
+        Parsed cue, or None if the data could not be decoded
     """
-    if not THREEFIVE_AVAILABLE:
-        return {
-            'error': 'threefive library not available',
-            'raw_data': scte35_data
-        }
-
     try:
         # Decode the SCTE-35 data
         if encoding == 'base64':
-            # threefive can handle base64 directly
-            cue = threefive.Cue(scte35_data)
+            # Decode here rather than in threefive so the fast decoder is
+            # used; restore any padding the packager stripped
+            padding = '=' * (-len(scte35_data) % 4)
+            scte35_bytes = b64decode(scte35_data + padding, validate=True)
         else:
-            # For hex, convert to bytes
+            # For hex, convert to bytes (HLS writes a 0x prefix)
+            if scte35_data[:2] in ('0x', '0X'):
+                scte35_data = scte35_data[2:]
             scte35_bytes = bytes.fromhex(scte35_data)
-            cue = threefive.Cue(scte35_bytes)
-
-        # Decode the cue
-        cue.decode()
-
-        # Extract command information
-        command_info = {}
-        if hasattr(cue, 'command'):
-            cmd = cue.command
-            command_info = {
-                'command_type': cmd.command_type if hasattr(cmd, 'command_type') else None,
-                'pts': cmd.pts_time if hasattr(cmd, 'pts_time') else None,
-                'command_length': cmd.command_length if hasattr(cmd, 'command_length') else None
-            }
-
-            # Splice Insert specific fields
-            if hasattr(cmd, 'splice_event_id'):
-                command_info['event_id'] = cmd.splice_event_id
-            if hasattr(cmd, 'out_of_network_indicator'):
-                command_info['out_of_network'] = cmd.out_of_network_indicator
-            if hasattr(cmd, 'program_splice_flag'):
-                command_info['program_splice_flag'] = cmd.program_splice_flag
-            if hasattr(cmd, 'duration_flag'):
-                command_info['duration_flag'] = cmd.duration_flag
-            if hasattr(cmd, 'break_duration'):
-                command_info['break_duration'] = cmd.break_duration
-            if hasattr(cmd, 'auto_return'):
-                command_info['auto_return'] = cmd.auto_return
-            if hasattr(cmd, 'splice_immediate_flag'):
-                command_info['splice_immediate_flag'] = cmd.splice_immediate_flag
-
-        # Extract descriptor information
-        descriptors = []
-        if hasattr(cue, 'descriptors'):
-            for desc in cue.descriptors:
-                desc_info = {
-                    'tag': desc.tag if hasattr(desc, 'tag') else None,
-                }
-
-                # Segmentation descriptor
-                if hasattr(desc, 'segmentation_event_id'):
-                    desc_info['segmentation_event_id'] = desc.segmentation_event_id
-                if hasattr(desc, 'segmentation_type_id'):
-                    desc_info['segmentation_type_id'] = desc.segmentation_type_id
-                if hasattr(desc, 'segment_num'):
-                    desc_info['segment_num'] = desc.segment_num
-                if hasattr(desc, 'segments_expected'):
-                    desc_info['segments_expected'] = desc.segments_expected
-                if hasattr(desc, 'segmentation_duration'):
-                    desc_info['segmentation_duration'] = desc.segmentation_duration
-                if hasattr(desc, 'segmentation_upid'):
-                    desc_info['segmentation_upid'] = desc.segmentation_upid
-                if hasattr(desc, 'segmentation_upid_type'):
-                    desc_info['segmentation_upid_type'] = desc.segmentation_upid_type
-
-                descriptors.append(desc_info)
-
-        return {
-            'command': command_info,
-            'descriptors': descriptors,
-            'info_section': {
-                'table_id': cue.info_section.table_id if hasattr(cue, 'info_section') else None,
-                'protocol_version': cue.info_section.protocol_version if hasattr(cue, 'info_section') else None
-            }
-        }
 
-    except Exception as e:
-        return {
-            'error': str(e),
-            'raw_data': scte35_data
-        }
+        # threefive decodes the cue on construction
+        cue = threefive.Cue(scte35_bytes)
+    except Exception:
+        return None
+
+    cmd = cue.command
+    # The first (segmentation) descriptor describes the marker
+    desc = cue.descriptors[0] if cue.descriptors else None
+
+    # Prefer the segmentation event ID over the splice_insert one
+    event_id = parse_event_id(getattr(desc, 'segmentation_event_id', None))
+    if event_id is None:
+        event_id = parse_event_id(getattr(cmd, 'splice_event_id', None))
+
+    pts_time = getattr(cmd, 'pts_time', None)
+    seg_type_id = getattr(desc, 'segmentation_type_id', None)
+    upid = getattr(desc, 'segmentation_upid', None)
+
+    return ParsedCue(
+        command_type=SPLICE_COMMAND_TYPES.get(getattr(cmd, 'command_type', None), 'unknown'),
+        event_id=event_id,
+        pts=round(pts_time * PTS_CLOCK_RATE) if pts_time is not None else None,
+        duration=getattr(desc, 'segmentation_duration', None),
+        upid=str(upid) if upid is not None else None,
+        # Map segmentation type ID to description
+        segmentation_type=f"Type {seg_type_id}" if seg_type_id is not None else None,
+        out_of_network=bool(getattr(cmd, 'out_of_network_indicator', False)),
+        auto_return=bool(getattr(cmd, 'break_auto_return', False))
+    )
+
+
+if not THREEFIVE_AVAILABLE:
+    def parse_scte35_data(scte35_data: str, encoding: str = 'base64') -> Optional[ParsedCue]:
+        """
+        Stand-in used when threefive is not installed.
+
+        Args:
+            scte35_data: SCTE-35 data (base64 or hex encoded)
+            encoding: Encoding type ('base64' or 'hex')
+
+        Returns:
+            None, as no cue can be decoded
+        """
+        return None
+
+
+def build_scte35_marker(
+    parsed: ParsedCue,
+    event_id: Optional[int] = None,
+    pts: Optional[int] = None,
+    duration: Optional[float] = None
+) -> SCTE35Marker:
+    """
+    Build a marker from a parsed cue and manifest-level overrides.
+
+    The cue's fields already match the SCTE35Marker field types, so the
+    model is constructed without re-running validation per marker.
+
+    Args:
+        parsed: Parsed cue
+        event_id: Event ID from the manifest (defaults to the cue's)
+        pts: Presentation time from the manifest (defaults to the cue's
+            splice time in 90kHz ticks)
+        duration: Duration in seconds from the manifest (defaults to the
+            segmentation duration)
+
+    Returns:
+        SCTE35Marker object
+    """
+    return SCTE35Marker.model_construct(
+        event_id=parsed.event_id if event_id is None else event_id,
+        pts=parsed.pts if pts is None else pts,
+        command_type=parsed.command_type,
+        duration=parsed.duration if duration is None else duration,
+        upid=parsed.upid,
+        segmentation_type=parsed.segmentation_type,
+        out_of_network=parsed.out_of_network,
+        auto_return=parsed.auto_return,
+        pre_roll=None
+    )
+
+
+def iter_hls_scte35(playlist: Any) -> Iterator[SCTE35Marker]:
+    """
+    Lazily extract SCTE-35 markers from HLS manifest.
+
+    Segments are parsed only as markers are consumed, so callers that need
+    just the first few markers stop early.
+
+    Args:
+        playlist: Parsed M3U8 playlist object
+
+    Yields:
+        SCTE35Marker objects in playlist order
+    """
+    # Check for SCTE-35 in segments (EXT-X-SCTE35 tags)
+    segments = getattr(playlist, 'segments', None) or ()
+    for segment in segments:
+        # Check for SCTE-35 cue out/in (most segments carry none)
+        scte35_data = getattr(segment, 'scte35', None)
+        if scte35_data:
+            parsed = parse_scte35_data(scte35_data)
+
+            if parsed is not None:
+                yield build_scte35_marker(parsed)
+
+        # Check for SCTE-35 in DATERANGE tags
+        for daterange in getattr(segment, 'dateranges', None) or ():
+            # Extract SCTE-35 data from daterange
+            try:
+                scte35_cmd, scte35_out, scte35_in = DATERANGE_SCTE35_ATTRS(daterange)
+            except AttributeError:
+                continue
+
+            # DATERANGE SCTE35-* attributes are hexadecimal sequences
+            scte35_data = scte35_cmd or scte35_out or scte35_in
+            if scte35_data:
+                parsed = parse_scte35_data(scte35_data, 'hex')
+
+                if parsed is not None:
+                    yield build_scte35_marker(
+                        parsed, duration=getattr(daterange, 'duration', None)
+                    )
 
 
 def extract_hls_scte35(playlist: Any) -> List[SCTE35Marker]:
@@ -125,88 +285,80 @@ def extract_hls_scte35(playlist: Any) -> List[SCTE35Marker]:
     Returns:
         List of SCTE35Marker objects
     """
-    markers = []
+    return list(iter_hls_scte35(playlist))
 
-    # Check for SCTE-35 in segments (EXT-X-SCTE35 tags)
-    if hasattr(playlist, 'segments') and playlist.segments:
-        for segment in playlist.segments:
-            # Check for SCTE-35 cue out/in
-            if hasattr(segment, 'scte35'):
-                scte35_data = segment.scte35
-                parsed = parse_scte35_data(scte35_data)
-
-                if 'error' not in parsed:
-                    cmd = parsed.get('command', {})
-                    descs = parsed.get('descriptors', [])
-
-                    # Extract main descriptor info
-                    seg_type = None
-                    upid = None
-                    duration = None
-                    event_id = None
-
-                    if descs:
-                        desc = descs[0]
-                        seg_type_id = desc.get('segmentation_type_id')
-                        if seg_type_id:
-                            # Map segmentation type ID to description
-                            seg_type = f"Type {seg_type_id}"
-                        upid = desc.get('segmentation_upid')
-                        seg_duration = desc.get('segmentation_duration')
-                        if seg_duration:
-                            duration = seg_duration / 90000.0  # Convert to seconds
-                        event_id = desc.get('segmentation_event_id')
-
-                    if not event_id:
-                        event_id = cmd.get('event_id')
-
-                    marker = SCTE35Marker(
-                        event_id=event_id,
-                        pts=cmd.get('pts'),
-                        command_type=cmd.get('command_type', 'unknown'),
-                        duration=duration,
-                        upid=upid,
-                        segmentation_type=seg_type,
-                        out_of_network=cmd.get('out_of_network', False),
-                        auto_return=cmd.get('auto_return', False),
-                        pre_roll=None
-                    )
-                    markers.append(marker)
-
-            # Check for SCTE-35 in DATERANGE tags
-            if hasattr(segment, 'dateranges') and segment.dateranges:
-                for daterange in segment.dateranges:
-                    if hasattr(daterange, 'scte35_cmd') or hasattr(daterange, 'scte35_out') or hasattr(daterange, 'scte35_in'):
-                        # Extract SCTE-35 data from daterange
-                        scte35_cmd = getattr(daterange, 'scte35_cmd', None)
-                        scte35_out = getattr(daterange, 'scte35_out', None)
-                        scte35_in = getattr(daterange, 'scte35_in', None)
-
-                        scte35_data = scte35_cmd or scte35_out or scte35_in
-                        if scte35_data:
-                            parsed = parse_scte35_data(scte35_data)
-
-                            if 'error' not in parsed:
-                                cmd = parsed.get('command', {})
-                                descs = parsed.get('descriptors', [])
-
-                                marker = SCTE35Marker(
-                                    event_id=cmd.get('event_id'),
-                                    pts=cmd.get('pts'),
-                                    command_type=cmd.get('command_type', 'unknown'),
-                                    duration=getattr(daterange, 'duration', None),
-                                    upid=descs[0].get('segmentation_upid') if descs else None,
-                                    segmentation_type=descs[0].get('segmentation_type_id') if descs else None,
-                                    out_of_network=cmd.get('out_of_network', False),
-                                    auto_return=cmd.get('auto_return', False),
-                                    pre_roll=None
-                                )
-                                markers.append(marker)
-
-    return markers
-
-
-def extract_dash_scte35(root: ET.Element, namespaces: Dict[str, str]) -> List[SCTE35Marker]:
+
+def iter_dash_scte35(root: ET._Element, namespaces: Dict[str, str]) -> Iterator[SCTE35Marker]:
+    """
+    Lazily extract SCTE-35 markers from DASH manifest.
+
+    Args:
+        root: MPD root element
+        namespaces: XML namespaces
+
+    Yields:
+        SCTE35Marker objects in document order
+    """
+    xpaths = get_scte35_xpaths(
+        namespaces.get('mpd', MPD_NAMESPACE),
+        namespaces.get('scte35', SCTE35_NAMESPACE)
+    )
+
+    # Look for EventStream elements with SCTE-35 scheme
+    for event_stream in xpaths['event_streams'](root):
+        scheme_id_uri = event_stream.get('schemeIdUri', '')
+
+        # Check if this is a SCTE-35 event stream carrying binary cues
+        # (plain xml streams hold splice info as XML elements only)
+        scheme_match = SCTE35_SCHEME_RE.match(scheme_id_uri)
+        if scheme_match and scheme_match.group(1) != 'xml':
+            # xml+bin streams wrap the cue in Signal/Binary elements
+            has_signal = scheme_match.group(1) == 'xml+bin'
+
+            # Seconds per timescale tick, shared by all events of the stream
+            timescale = event_stream.get('timescale', '1')
+            tick_seconds = None
+            if timescale.isdigit() and int(timescale) > 0:
+                tick_seconds = 1.0 / int(timescale)
+
+            # Extract events
+            for event in xpaths['events'](event_stream):
+                presentation_time = event.get('presentationTime')
+                duration = event.get('duration')
+                event_id = event.get('id')
+
+                # Event data might be in text content or Signal element
+                scte35_data = (event.text or '').strip()
+                if not scte35_data and has_signal:
+                    # Look for Signal/Binary element
+                    binary = xpaths['binary'](event)
+                    if binary:
+                        scte35_data = binary[0].strip()
+
+                if scte35_data:
+                    parsed = parse_scte35_data(scte35_data)
+
+                    if parsed is not None:
+                        # Convert duration from timescale to seconds
+                        # (both are unsigned integers in the MPD schema)
+                        duration_sec = None
+                        if duration and duration.isdigit() and tick_seconds is not None:
+                            duration_sec = int(duration) * tick_seconds
+
+                        # Convert presentation time
+                        pts = None
+                        if presentation_time and presentation_time.isdigit():
+                            pts = int(presentation_time)
+
+                        yield build_scte35_marker(
+                            parsed,
+                            event_id=parse_event_id(event_id),
+                            pts=pts,
+                            duration=duration_sec
+                        )
+
+
+def extract_dash_scte35(root: ET._Element, namespaces: Dict[str, str]) -> List[SCTE35Marker]:
     """
     Extract SCTE-35 markers from DASH manifest.
 
@@ -217,105 +369,69 @@ def extract_dash_scte35(root: ET.Element, namespaces: Dict[str, str]) -> List[SC
     Returns:
         List of SCTE35Marker objects
     """
-    markers = []
+    return list(iter_dash_scte35(root, namespaces))
 
-    # Look for EventStream elements with SCTE-35 scheme
-    scte35_schemes = [
-        'urn:scte:scte35:2013:bin',
-        'urn:scte:scte35:2014:xml+bin',
-        'urn:scte:scte35:2013:xml'
-    ]
-
-    for period in root.findall('.//mpd:Period', namespaces):
-        for event_stream in period.findall('.//mpd:EventStream', namespaces):
-            scheme_id_uri = event_stream.get('schemeIdUri', '')
-
-            # Check if this is a SCTE-35 event stream
-            if any(scheme in scheme_id_uri for scheme in scte35_schemes):
-                # Extract events
-                for event in event_stream.findall('.//mpd:Event', namespaces):
-                    presentation_time = event.get('presentationTime')
-                    duration = event.get('duration')
-                    event_id = event.get('id')
-
-                    # Event data might be in text content or Signal element
-                    scte35_data = None
-                    if event.text:
-                        scte35_data = event.text.strip()
-                    else:
-                        # Look for Signal/Binary element
-                        signal = event.find('.//scte35:Signal', namespaces)
-                        if signal is not None:
-                            binary = signal.find('.//scte35:Binary', namespaces)
-                            if binary is not None and binary.text:
-                                scte35_data = binary.text.strip()
-
-                    if scte35_data:
-                        parsed = parse_scte35_data(scte35_data)
-
-                        if 'error' not in parsed:
-                            cmd = parsed.get('command', {})
-                            descs = parsed.get('descriptors', [])
-
-                            # Convert duration from timescale to seconds
-                            duration_sec = None
-                            if duration:
-                                timescale = event_stream.get('timescale', '1')
-                                try:
-                                    duration_sec = float(duration) / float(timescale)
-                                except:
-                                    pass
-
-                            # Convert presentation time
-                            pts = None
-                            if presentation_time:
-                                try:
-                                    pts = int(presentation_time)
-                                except:
-                                    pass
-
-                            marker = SCTE35Marker(
-                                event_id=event_id or cmd.get('event_id'),
-                                pts=pts or cmd.get('pts'),
-                                command_type=cmd.get('command_type', 'unknown'),
-                                duration=duration_sec,
-                                upid=descs[0].get('segmentation_upid') if descs else None,
-                                segmentation_type=descs[0].get('segmentation_type_id') if descs else None,
-                                out_of_network=cmd.get('out_of_network', False),
-                                auto_return=cmd.get('auto_return', False),
-                                pre_roll=None
-                            )
-                            markers.append(marker)
-
-    return markers
-
-
-async def extract_scte35_markers(url: str, manifest_type: str, parsed_data: Dict) -> List[SCTE35Marker]:
+
+def collect_scte35_markers(
+    manifest_type: str,
+    parsed_data: Dict,
+    limit: Optional[int] = None
+) -> List[SCTE35Marker]:
+    """
+    Extract SCTE-35 markers from a parsed manifest (blocking).
+
+    Args:
+        manifest_type: Type of manifest ('hls' or 'dash')
+        parsed_data: Parsed manifest data
+        limit: Maximum number of markers to extract (None for all)
+
+    Returns:
+        List of SCTE35Marker objects
+    """
+    markers = iter(())
+    if manifest_type == 'hls':
+        playlist = parsed_data.get('raw_playlist')
+        if playlist:
+            markers = iter_hls_scte35(playlist)
+    elif manifest_type == 'dash':
+        # Only the tree dash_parser already built is searched; the manifest
+        # is never parsed a second time here
+        root = parsed_data.get('raw_xml')
+        namespaces = parsed_data.get('namespaces', {})
+        if isinstance(root, ET._Element):
+            markers = iter_dash_scte35(root, namespaces)
+
+    return list(itertools.islice(markers, limit))
+
+
+async def extract_scte35_markers(
+    url: str,
+    manifest_type: str,
+    parsed_data: Dict,
+    limit: Optional[int] = None
+) -> List[SCTE35Marker]:
     """
     Extract SCTE-35 markers from manifest.
 
+    Cue decoding is CPU-bound, so it runs in a worker thread to keep the
+    event loop free for the fragment downloads it is gathered with.
+
     Args:
         url: Manifest URL
         manifest_type: Type of manifest ('hls' or 'dash')
         parsed_data: Parsed manifest data
+        limit: Maximum number of markers to extract (None for all); the
+            manifest is not scanned past the last marker returned
 
     Returns:
         List of SCTE35Marker objects
     """
     try:
-        if manifest_type == 'hls':
-            playlist = parsed_data.get('raw_playlist')
-            if playlist:
-                return extract_hls_scte35(playlist)
-        elif manifest_type == 'dash':
-            root = parsed_data.get('raw_xml')
-            namespaces = parsed_data.get('namespaces', {})
-            if root is not None:
-                return extract_dash_scte35(root, namespaces)
-
-        return []
+        return await asyncio.to_thread(
+            collect_scte35_markers, manifest_type, parsed_data, limit
+        )
 
     except Exception as e:
         # Log error but don't fail the entire request
-        print(f"Error extracting SCTE-35 markers: {e}")
+        logger.exception("Error extracting SCTE-35 markers: %s", e)
         return []
@@ -6,22 +6,33 @@ import pytest
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock
 
+from fastapi.testclient import TestClient
 
-@pytest.fixture
+from main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    """API test client, with the app lifespan run once per session"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
 def test_data():
-    """Load test data from test_data.json"""
+    """Load test data from test_data.json (once per run; do not modify)"""
     test_data_path = Path(__file__).parent.parent / "test_data.json"
     with open(test_data_path, 'r') as f:
         return json.load(f)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def hls_streams(test_data):
     """Get HLS test streams"""
     return test_data['hls_streams']
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def dash_streams(test_data):
     """Get DASH test streams"""
     return test_data['dash_streams']
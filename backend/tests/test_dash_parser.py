@@ -0,0 +1,190 @@
+"""
+Tests for DASH manifest parsing.
+"""
+import httpx
+import pytest
+
+import services.dash_parser as dash_parser
+
+
+@pytest.fixture
+def parse_dash(monkeypatch):
+    """Parse a DASH manifest string without touching the network"""
+    async def _parse(content, url="https://example.com/stream.mpd"):
+        async def fake_fetch(fetch_url, headers=None):
+            return httpx.Response(200, text=content, request=httpx.Request("GET", fetch_url))
+
+        monkeypatch.setattr(dash_parser, "fetch_manifest", fake_fetch)
+        return await dash_parser.parse_dash_manifest(url)
+
+    return _parse
+
+
+class TestParseDashManifest:
+    """Tests for parse_dash_manifest"""
+
+    async def test_parses_video_bitrates(self, parse_dash, sample_dash_manifest):
+        """Video representations should become ordered bitrate levels"""
+        result = await parse_dash(sample_dash_manifest)
+        bitrates = result['bitrates']
+
+        assert [b.level for b in bitrates] == [0, 1]
+        assert [b.bitrate for b in bitrates] == [2000000, 5000000]
+        assert bitrates[1].resolution == "1920x1080"
+        assert bitrates[0].codec == "H.264"
+
+    async def test_parses_audio_tracks(self, parse_dash, sample_dash_manifest):
+        """Audio adaptation sets should become audio tracks"""
+        result = await parse_dash(sample_dash_manifest)
+        audio_tracks = result['audio_tracks']
+
+        assert len(audio_tracks) == 1
+        assert audio_tracks[0].language == "en"
+        assert audio_tracks[0].codec == "AAC"
+        assert audio_tracks[0].bitrate == 128000
+
+    async def test_manifest_with_encoding_declaration(self, parse_dash, sample_dash_manifest):
+        """Manifests starting with an XML declaration should parse"""
+        assert sample_dash_manifest.startswith('<?xml version="1.0" encoding="UTF-8"?>')
+        result = await parse_dash(sample_dash_manifest)
+        assert result['namespaces']['mpd'] == 'urn:mpeg:dash:schema:mpd:2011'
+
+    async def test_manifest_bytes_use_declared_encoding(self, monkeypatch):
+        """Raw bytes should be decoded per the XML declaration, not as UTF-8"""
+        content = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011">
+  <Period>
+    <AdaptationSet mimeType="audio/mp4" lang="fr">
+      <Label>Fran\u00e7ais</Label>
+      <Representation id="a1" bandwidth="128000" codecs="mp4a.40.2"/>
+    </AdaptationSet>
+  </Period>
+</MPD>
+""".encode('iso-8859-1')
+
+        async def fake_fetch(url, headers=None):
+            return httpx.Response(200, content=content, request=httpx.Request("GET", url))
+
+        monkeypatch.setattr(dash_parser, "fetch_manifest", fake_fetch)
+        result = await dash_parser.parse_dash_manifest("https://example.com/stream.mpd")
+
+        assert result['audio_tracks'][0].name == "Fran\u00e7ais"
+
+    async def test_detects_playready_drm(self, parse_dash):
+        """PlayReady ContentProtection should yield DRM info with license URL"""
+        content = """<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" xmlns:cenc="urn:mpeg:cenc:2013" xmlns:mspr="urn:microsoft:playready">
+  <Period>
+    <AdaptationSet mimeType="video/mp4">
+      <ContentProtection schemeIdUri="urn:mpeg:dash:mp4protection:2011" value="cenc" cenc:default_KID="10000000-1000-1000-1000-100000000001"/>
+      <ContentProtection schemeIdUri="urn:microsoft:playready">
+        <mspr:laurl>https://license.example.com/playready</mspr:laurl>
+        <cenc:pssh>AAAAQHBzc2g=</cenc:pssh>
+      </ContentProtection>
+      <Representation id="1" bandwidth="2000000" width="1280" height="720" codecs="avc1.64001f"/>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+        result = await parse_dash(content)
+        drm_info = result['drm_info']
+
+        assert drm_info.system == "PlayReady"
+        assert drm_info.key_id == "10000000-1000-1000-1000-100000000001"
+        assert drm_info.license_url == "https://license.example.com/playready"
+        assert drm_info.pssh == "AAAAQHBzc2g="
+
+    async def test_entities_are_not_expanded(self, parse_dash):
+        """Internal DTD entities should be left unexpanded"""
+        content = """<?xml version="1.0"?>
+<!DOCTYPE MPD [<!ENTITY lol "lollollollollollollollollollol">]>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011">
+  <Period>
+    <AdaptationSet mimeType="audio/mp4" lang="en">
+      <Label>&lol;</Label>
+      <Representation id="a1" bandwidth="128000" codecs="mp4a.40.2"/>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+        result = await parse_dash(content)
+        assert "lollol" not in (result['audio_tracks'][0].name or "")
+
+    async def test_invalid_xml_returns_400(self, parse_dash):
+        """Malformed XML should be reported as a client error"""
+        from fastapi import HTTPException
+
+        with pytest.raises(HTTPException) as exc_info:
+            await parse_dash("<MPD><Period></MPD>")
+        assert exc_info.value.status_code == 400
+
+    async def test_unchanged_manifest_is_not_reparsed(self, monkeypatch, sample_dash_manifest):
+        """A 304 on revalidation should return None instead of a new parse"""
+        requests = []
+
+        async def fake_fetch(url, headers=None):
+            requests.append(headers)
+            request = httpx.Request("GET", url)
+            if headers and headers.get('If-None-Match') == '"v1"':
+                return httpx.Response(304, request=request)
+            return httpx.Response(200, text=sample_dash_manifest, headers={'ETag': '"v1"'}, request=request)
+
+        monkeypatch.setattr(dash_parser, "fetch_manifest", fake_fetch)
+
+        first = await dash_parser.parse_dash_manifest("https://example.com/vod.mpd")
+        second = await dash_parser.parse_dash_manifest("https://example.com/vod.mpd", first['request_headers'])
+
+        assert requests == [None, {'If-None-Match': '"v1"'}]
+        assert first['request_headers'] == {'If-None-Match': '"v1"'}
+        assert second is None
+
+
+class TestGetDrmSystem:
+    """Tests for get_drm_system"""
+
+    @pytest.mark.parametrize("scheme_id_uri,expected", [
+        ("urn:uuid:EDEF8BA9-79D6-4ACE-A3C8-27DCD51D21ED", "Widevine"),
+        ("urn:uuid:9a04f079-9840-4286-ab92-e65be0885f95", "PlayReady"),
+        ("urn:uuid:94ce86fb-07ff-4f43-adb8-93d2fa968ca2", "FairPlay"),
+        ("urn:microsoft:playready", "PlayReady"),
+        ("urn:mpeg:dash:mp4protection:2011", None),
+        ("urn:uuid:00000000-0000-0000-0000-000000000000", None),
+    ])
+    def test_identifies_system(self, scheme_id_uri, expected):
+        """Systems are identified by UUID, falling back to their name"""
+        assert dash_parser.get_drm_system(scheme_id_uri) == expected
+
+
+class TestParseFrameRate:
+    """Tests for parse_frame_rate"""
+
+    @pytest.mark.parametrize("frame_rate,expected", [
+        ("25", 25.0),
+        ("29.97", 29.97),
+        ("30000/1001", 30000 / 1001),
+        ("30/0", None),
+        ("fast", None),
+        (None, None),
+    ])
+    def test_parses_frame_rate(self, frame_rate, expected):
+        """Integer, decimal and fractional rates are supported"""
+        assert dash_parser.parse_frame_rate(frame_rate) == expected
+
+
+class TestParseDrmInfo:
+    """Tests for parse_drm_info"""
+
+    def test_searches_manifest_without_namespace(self):
+        """Standalone calls should also find un-namespaced ContentProtection"""
+        root = dash_parser.ET.fromstring(b"""<MPD>
+  <Period>
+    <AdaptationSet mimeType="video/mp4">
+      <ContentProtection schemeIdUri="urn:mpeg:dash:mp4protection:2011" default_KID="10000000-1000-1000-1000-100000000001"/>
+      <ContentProtection schemeIdUri="urn:uuid:edef8ba9-79d6-4ace-a3c8-27dcd51d21ed"/>
+    </AdaptationSet>
+  </Period>
+</MPD>""")
+        drm_info = dash_parser.parse_drm_info(root, dash_parser.get_namespace(root))
+
+        assert drm_info.system == "Widevine"
+        assert drm_info.key_id == "10000000-1000-1000-1000-100000000001"
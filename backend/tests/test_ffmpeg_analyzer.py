@@ -0,0 +1,270 @@
+"""
+Tests for FFmpeg (PyAV) fragment analysis.
+"""
+import io
+
+import av
+import httpx
+import m3u8
+import pytest
+
+import services.dash_parser as dash_parser
+import services.ffmpeg_analyzer as ffmpeg_analyzer
+
+
+@pytest.fixture(scope="module")
+def sample_ts_fragment():
+    """Encode a tiny MPEG-TS video fragment (10 frames, 64x48 @ 25fps)"""
+    buffer = io.BytesIO()
+    container = av.open(buffer, 'w', format='mpegts')
+    stream = container.add_stream('mpeg2video', rate=25)
+    stream.width = 64
+    stream.height = 48
+    stream.pix_fmt = 'yuv420p'
+
+    for index in range(10):
+        frame = av.VideoFrame(64, 48, 'yuv420p')
+        for plane in frame.planes:
+            plane.update(bytes([index * 10]) * plane.buffer_size)
+        frame.pts = index
+        for packet in stream.encode(frame):
+            container.mux(packet)
+
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()
+
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def clear_fragment_cache():
+    """Keep cached fragment analyses from leaking between tests"""
+    ffmpeg_analyzer._fragment_analysis_cache.clear()
+    yield
+    ffmpeg_analyzer._fragment_analysis_cache.clear()
+
+
+class TestAnalyzeFragment:
+    """Tests for analyze_fragment_with_pyav"""
+
+    def test_extracts_video_metadata(self, sample_ts_fragment):
+        """Container and video stream details should be reported"""
+        metadata = ffmpeg_analyzer.analyze_fragment_with_pyav(sample_ts_fragment)
+
+        assert metadata['container_format'] == 'mpegts'
+        assert metadata['video_codec'] == 'mpeg2video'
+        assert metadata['resolution'] == '64x48'
+        assert metadata['frame_rate'] == 25.0
+        assert metadata['color_space'] == 'yuv420p'
+        assert metadata['file_size'] == len(sample_ts_fragment)
+        assert metadata['is_encrypted'] is False
+
+    def test_identical_fragments_are_probed_once(self, monkeypatch, sample_ts_fragment):
+        """Repeat analyses of the same bytes should reuse the cached result"""
+        probe = ffmpeg_analyzer.probe_fragment_with_pyav
+        calls = []
+
+        def counting_probe(fragment_data, probe_encryption=True):
+            calls.append(len(fragment_data))
+            return probe(fragment_data, probe_encryption)
+
+        monkeypatch.setattr(ffmpeg_analyzer, "probe_fragment_with_pyav", counting_probe)
+
+        first = ffmpeg_analyzer.analyze_fragment_with_pyav(sample_ts_fragment)
+        second = ffmpeg_analyzer.analyze_fragment_with_pyav(bytes(sample_ts_fragment))
+
+        assert len(calls) == 1
+        assert second == first
+
+    def test_fragment_cache_is_accessed_under_lock(self, monkeypatch, sample_ts_fragment):
+        """Worker threads share the fragment cache, so every access must hold its lock"""
+        from services.cache import TTLCache
+
+        accesses = []
+
+        class CheckingCache(TTLCache):
+            def get(self, key):
+                accesses.append(ffmpeg_analyzer._fragment_analysis_lock.locked())
+                return super().get(key)
+
+            def set(self, key, value):
+                accesses.append(ffmpeg_analyzer._fragment_analysis_lock.locked())
+                super().set(key, value)
+
+        monkeypatch.setattr(ffmpeg_analyzer, "_fragment_analysis_cache", CheckingCache(maxsize=2, ttl=3600.0))
+
+        ffmpeg_analyzer.analyze_fragment_with_pyav(sample_ts_fragment)
+        ffmpeg_analyzer.analyze_fragment_with_pyav(sample_ts_fragment)
+
+        assert accesses == [True, True, True]
+
+    def test_metadata_only_probe_skips_decoding(self, monkeypatch, sample_ts_fragment):
+        """probe_encryption=False should report metadata without demuxing"""
+        demuxed = []
+        monkeypatch.setattr(av.container.InputContainer, "demux", lambda *args: demuxed.append(args) or iter(()))
+        metadata = ffmpeg_analyzer.analyze_fragment_with_pyav(sample_ts_fragment, probe_encryption=False)
+
+        assert demuxed == []
+        assert metadata['resolution'] == '64x48'
+        assert metadata['is_encrypted'] is False
+
+    def test_garbage_data_returns_empty_result(self):
+        """Undecodable bytes should not raise"""
+        assert ffmpeg_analyzer.analyze_fragment_with_pyav(b'not a video') == {}
+
+
+def mp4_box(box_type, payload=b''):
+    """Build a minimal ISOBMFF box"""
+    return (8 + len(payload)).to_bytes(4, 'big') + box_type + payload
+
+
+class TestHasEncryptionBoxes:
+    """Tests for has_encryption_boxes"""
+
+    def test_detects_protection_scheme_in_moov(self):
+        """A sinf box nested in moov marks the fragment as encrypted"""
+        data = mp4_box(b'ftyp', b'iso6') + mp4_box(b'moov', mp4_box(b'trak', mp4_box(b'sinf')))
+        assert ffmpeg_analyzer.has_encryption_boxes(data) is True
+
+    def test_ignores_media_data(self, sample_ts_fragment):
+        """Box names inside mdat and non-MP4 input are not encryption"""
+        data = mp4_box(b'ftyp', b'iso6') + mp4_box(b'moov') + mp4_box(b'mdat', b'senc' * 4)
+        assert ffmpeg_analyzer.has_encryption_boxes(data) is False
+        assert ffmpeg_analyzer.has_encryption_boxes(sample_ts_fragment) is False
+
+
+class TestGetFragmentSize:
+    """Tests for get_fragment_size"""
+
+    @pytest.mark.parametrize("status_code,headers,expected", [
+        (206, {'Content-Range': 'bytes 0-4194303/12582912'}, 12582912),
+        (206, {'Content-Range': 'bytes 0-4194303/*'}, None),
+        (200, {'Content-Length': '524288'}, 524288),
+        (200, {}, None),
+    ])
+    def test_reads_total_size(self, status_code, headers, expected):
+        """Ranged responses report the total after the slash in Content-Range"""
+        response = httpx.Response(status_code, headers=headers)
+        assert ffmpeg_analyzer.get_fragment_size(response) == expected
+
+
+class TestAnalyzeVideoFragments:
+    """Tests for analyze_video_fragments"""
+
+    async def test_levels_are_reported_in_order(self, monkeypatch, sample_ts_fragment):
+        """Concurrently probed levels should keep bitrate level order"""
+        fragment_urls = {
+            0: ["https://example.com/low.ts"],
+            1: ["https://example.com/missing.ts", "https://example.com/high.ts"],
+        }
+
+        async def fake_download(url, client=None):
+            return None if "missing" in url else (sample_ts_fragment, 1024 * 1024)
+
+        monkeypatch.setattr(ffmpeg_analyzer, "get_hls_fragment_urls", lambda parsed, url: fragment_urls)
+        monkeypatch.setattr(ffmpeg_analyzer, "download_fragment", fake_download)
+
+        metadata_list, drm_info = await ffmpeg_analyzer.analyze_video_fragments({}, 'hls')
+
+        assert [m.level for m in metadata_list] == [0, 1]
+        assert metadata_list[1].resolution == '64x48'
+        assert metadata_list[1].file_size == 1024 * 1024
+        assert drm_info is None
+
+
+class TestGetDashFragmentUrls:
+    """Tests for get_dash_fragment_urls"""
+
+    @staticmethod
+    def parse(content):
+        parsed = dash_parser.parse_mpd_document(content.encode('utf-8'))
+        return ffmpeg_analyzer.get_dash_fragment_urls(parsed, "https://cdn.example.com/live/stream.mpd")
+
+    def test_expands_numbered_template(self):
+        """$Number$ templates inherit attributes and BaseURLs from parents"""
+        fragment_urls, init_urls = self.parse("""<MPD xmlns="urn:mpeg:dash:schema:mpd:2011">
+  <BaseURL>media/</BaseURL>
+  <Period>
+    <AdaptationSet mimeType="video/mp4">
+      <SegmentTemplate media="$RepresentationID$/seg-$Number%05d$.m4s" initialization="$RepresentationID$/init.mp4" startNumber="7"/>
+      <Representation id="720p" bandwidth="2000000"/>
+      <Representation id="1080p" bandwidth="5000000"/>
+    </AdaptationSet>
+  </Period>
+</MPD>""")
+
+        assert fragment_urls[1] == [
+            "https://cdn.example.com/live/media/1080p/seg-00007.m4s",
+            "https://cdn.example.com/live/media/1080p/seg-00008.m4s",
+        ]
+        assert init_urls[0] == "https://cdn.example.com/live/media/720p/init.mp4"
+
+    def test_expands_timeline_template(self):
+        """$Time$ templates follow SegmentTimeline start times and repeats"""
+        fragment_urls, _ = self.parse("""<MPD xmlns="urn:mpeg:dash:schema:mpd:2011">
+  <Period>
+    <AdaptationSet contentType="video">
+      <Representation id="v1" bandwidth="2000000">
+        <SegmentTemplate media="v1/$Bandwidth$/$Time$.m4s" timescale="90000">
+          <SegmentTimeline>
+            <S t="900000" d="180000" r="3"/>
+          </SegmentTimeline>
+        </SegmentTemplate>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>""")
+
+        assert fragment_urls[0] == [
+            "https://cdn.example.com/live/v1/2000000/900000.m4s",
+            "https://cdn.example.com/live/v1/2000000/1080000.m4s",
+        ]
+
+    def test_uses_segment_list_and_plain_base_url(self):
+        """SegmentList media and single-file BaseURLs are both supported"""
+        fragment_urls, init_urls = self.parse("""<MPD xmlns="urn:mpeg:dash:schema:mpd:2011">
+  <Period>
+    <AdaptationSet mimeType="video/mp4">
+      <Representation id="list" bandwidth="1000000">
+        <SegmentList>
+          <Initialization sourceURL="list/init.mp4"/>
+          <SegmentURL media="list/1.m4s"/>
+          <SegmentURL media="list/2.m4s"/>
+          <SegmentURL media="list/3.m4s"/>
+        </SegmentList>
+      </Representation>
+      <Representation id="file" bandwidth="2000000">
+        <BaseURL>https://other.example.com/file.mp4</BaseURL>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>""")
+
+        assert fragment_urls == {
+            0: ["https://cdn.example.com/live/list/1.m4s", "https://cdn.example.com/live/list/2.m4s"],
+            1: ["https://other.example.com/file.mp4"],
+        }
+        assert init_urls == {0: "https://cdn.example.com/live/list/init.mp4"}
+
+
+class TestGetHlsFragmentUrls:
+    """Tests for get_hls_fragment_urls"""
+
+    def test_samples_lowest_median_and_highest_levels(self):
+        """Large ladders are sampled by bandwidth, keeping original levels"""
+        bandwidths = [3000000, 800000, 6000000, 1500000, 400000]
+        playlist = m3u8.loads("#EXTM3U\n" + "".join(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth}\nv{index}.m3u8\n"
+            for index, bandwidth in enumerate(bandwidths)
+        ))
+
+        fragment_urls = ffmpeg_analyzer.get_hls_fragment_urls(
+            {'raw_playlist': playlist}, "https://example.com/master.m3u8"
+        )
+
+        assert fragment_urls == {
+            2: ["https://example.com/v2.m3u8"],
+            3: ["https://example.com/v3.m3u8"],
+            4: ["https://example.com/v4.m3u8"],
+        }
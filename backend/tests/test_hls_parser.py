@@ -0,0 +1,108 @@
+"""
+Tests for HLS manifest parsing.
+"""
+import asyncio
+import gzip
+
+import httpx
+import m3u8
+import pytest
+
+import services.hls_parser as hls_parser
+import services.http_client as http_client
+
+
+@pytest.fixture
+def serve_manifest(monkeypatch):
+    """Route the shared HTTP client to an in-memory handler"""
+    def _serve(handler):
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(http_client, "_client_loop", asyncio.get_running_loop())
+
+    return _serve
+
+
+class TestFetchManifest:
+    """Tests for fetch_manifest"""
+
+    async def test_decodes_compressed_body(self, serve_manifest, sample_hls_manifest):
+        """Streamed bodies should be content-decoded once"""
+        serve_manifest(lambda request: httpx.Response(
+            200,
+            content=gzip.compress(sample_hls_manifest.encode()),
+            headers={'Content-Encoding': 'gzip', 'ETag': '"v1"'}
+        ))
+
+        response = await hls_parser.fetch_manifest("https://example.com/master.m3u8")
+
+        assert response.text == sample_hls_manifest
+        assert response.headers['etag'] == '"v1"'
+
+    async def test_rejects_oversized_body(self, monkeypatch, serve_manifest):
+        """Bodies past the limit should be refused with a 400"""
+        from fastapi import HTTPException
+
+        async def chunked_body():
+            for _ in range(4):
+                yield b'#' * 800
+
+        monkeypatch.setattr(hls_parser, "MAX_MANIFEST_SIZE", 1024)
+        serve_manifest(lambda request: httpx.Response(200, content=chunked_body()))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await hls_parser.fetch_manifest("https://example.com/master.m3u8")
+        assert exc_info.value.status_code == 400
+
+
+class TestParseBitrates:
+    """Tests for parse_bitrates"""
+
+    def test_parses_variant_codecs(self, sample_hls_manifest):
+        """Video and audio codecs should both come from the CODECS attribute"""
+        bitrates = hls_parser.parse_bitrates(m3u8.loads(sample_hls_manifest))
+
+        assert [b.bitrate for b in bitrates] == [2000000, 5000000]
+        assert bitrates[0].resolution == "1280x720"
+        assert bitrates[0].codec == "H.264"
+        assert bitrates[0].audio_codec == "AAC"
+
+    def test_recognises_hevc_and_av1(self):
+        """hev1 and av01 codec strings should map to readable names"""
+        playlist = m3u8.loads("""#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=3000000,CODECS="hev1.1.6.L93.B0,ec-3"
+hevc.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2000000,CODECS="av01.0.05M.08"
+av1.m3u8
+""")
+        bitrates = hls_parser.parse_bitrates(playlist)
+
+        assert [(b.codec, b.audio_codec) for b in bitrates] == [("H.265", "EAC3"), ("AV1", None)]
+
+
+class TestParseHlsManifest:
+    """Tests for parse_hls_manifest"""
+
+    async def test_unchanged_manifest_is_not_reparsed(self, monkeypatch, sample_hls_manifest):
+        """A 304 on revalidation should return None instead of a new parse"""
+        requests = []
+
+        async def fake_fetch(url, headers=None):
+            requests.append(headers)
+            request = httpx.Request("GET", url)
+            if headers and headers.get('If-Modified-Since') == 'Wed, 01 Jan 2025 00:00:00 GMT':
+                return httpx.Response(304, request=request)
+            return httpx.Response(
+                200,
+                text=sample_hls_manifest,
+                headers={'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'},
+                request=request
+            )
+
+        monkeypatch.setattr(hls_parser, "fetch_manifest", fake_fetch)
+
+        first = await hls_parser.parse_hls_manifest("https://example.com/master.m3u8")
+        second = await hls_parser.parse_hls_manifest("https://example.com/master.m3u8", first['request_headers'])
+
+        assert requests == [None, {'If-Modified-Since': 'Wed, 01 Jan 2025 00:00:00 GMT'}]
+        assert second is None
+        assert [b.bitrate for b in first['bitrates']] == [2000000, 5000000]
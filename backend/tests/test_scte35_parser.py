@@ -0,0 +1,232 @@
+"""
+Tests for SCTE-35 marker parsing.
+"""
+import m3u8
+import pytest
+
+import services.dash_parser as dash_parser
+import services.scte35_parser as scte35_parser
+from models.schemas import SCTE35Marker
+
+
+# splice_insert (event 1, out of network, 212.5s break)
+SPLICE_INSERT_CUE = "/DAlAAAAAAAAAP/wFAUAAAABf+/+LRQrAP4BI9MIAAEBAQAAfxV6SQ=="
+# time_signal with a segmentation descriptor (type 0x35)
+TIME_SIGNAL_CUE = "/DAvAAAAAAAA///wBQb+dGKQoAAZAhdDVUVJSAAAjn+fCAgAAAAALKChijUCAHnJ/Mw="
+
+# Period with a binary event and an xml+bin Signal/Binary event
+SCTE35_MPD = f"""<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" xmlns:scte35="http://www.scte.org/schemas/35/2016">
+  <Period>
+    <EventStream schemeIdUri="urn:scte:scte35:2013:bin" timescale="90000">
+      <Event id="1" presentationTime="900000" duration="2700000">{SPLICE_INSERT_CUE}</Event>
+    </EventStream>
+    <EventStream schemeIdUri="urn:scte:scte35:2014:xml+bin">
+      <Event id="2">
+        <scte35:Signal>
+          <scte35:Binary>{TIME_SIGNAL_CUE}</scte35:Binary>
+        </scte35:Signal>
+      </Event>
+    </EventStream>
+    <EventStream schemeIdUri="urn:example:id3">
+      <Event id="3">ignored</Event>
+    </EventStream>
+  </Period>
+</MPD>"""
+
+
+@pytest.fixture(autouse=True)
+def clear_scte35_cache():
+    """Keep memoized cue parses from leaking between tests"""
+    scte35_parser.parse_scte35_data.cache_clear()
+    yield
+    scte35_parser.parse_scte35_data.cache_clear()
+
+
+class TestParseScte35Data:
+    """Tests for parse_scte35_data"""
+
+    def test_parses_splice_insert(self):
+        """Command fields of a splice_insert cue should be reported"""
+        parsed = scte35_parser.parse_scte35_data(SPLICE_INSERT_CUE)
+
+        assert parsed.command_type == 'splice_insert'
+        assert parsed.event_id == 1
+        assert parsed.out_of_network is True
+        assert parsed.auto_return is True
+        assert parsed.segmentation_type is None
+
+    def test_parses_segmentation_descriptor(self):
+        """Descriptor fields of a time_signal cue should be reported"""
+        parsed = scte35_parser.parse_scte35_data(TIME_SIGNAL_CUE)
+
+        assert parsed.command_type == 'time_signal'
+        assert parsed.segmentation_type == 'Type 53'
+        assert parsed.upid == '0x2ca0a18a'
+
+    def test_cue_values_are_normalized(self):
+        """Hex event ids and splice times in seconds become integers"""
+        parsed = scte35_parser.parse_scte35_data(TIME_SIGNAL_CUE)
+
+        assert parsed.event_id == 0x4800008e
+        assert parsed.pts == round(21695.740089 * 90000)
+
+    @pytest.mark.parametrize("scte35_data,encoding", [
+        (SPLICE_INSERT_CUE.rstrip('='), 'base64'),
+        (scte35_parser.b64decode(SPLICE_INSERT_CUE).hex(), 'hex'),
+    ])
+    def test_accepts_unpadded_base64_and_hex(self, scte35_data, encoding):
+        """Stripped base64 padding and hex input decode to the same cue"""
+        expected = scte35_parser.parse_scte35_data(SPLICE_INSERT_CUE)
+        assert scte35_parser.parse_scte35_data(scte35_data, encoding) == expected
+
+    def test_invalid_data_returns_none(self):
+        """Undecodable input should be skipped, not raised"""
+        assert scte35_parser.parse_scte35_data("not base64!!") is None
+
+    def test_repeated_cues_are_decoded_once(self, monkeypatch):
+        """A cue repeated across segments should reuse the first parse"""
+        cue = scte35_parser.threefive.Cue
+        decoded = []
+
+        def counting_cue(data):
+            decoded.append(data)
+            return cue(data)
+
+        monkeypatch.setattr(scte35_parser.threefive, "Cue", counting_cue)
+
+        first = scte35_parser.parse_scte35_data(SPLICE_INSERT_CUE)
+        second = scte35_parser.parse_scte35_data(SPLICE_INSERT_CUE)
+
+        assert len(decoded) == 1
+        assert second is first
+
+
+class TestExtractDashScte35:
+    """Tests for extract_dash_scte35"""
+
+    def test_finds_event_payloads(self, monkeypatch):
+        """Inline and Signal/Binary payloads of SCTE-35 streams are parsed"""
+        payloads = []
+        monkeypatch.setattr(
+            scte35_parser, "parse_scte35_data",
+            lambda scte35_data: payloads.append(scte35_data)
+        )
+        parsed = dash_parser.parse_mpd_document(SCTE35_MPD.encode('utf-8'))
+
+        scte35_parser.extract_dash_scte35(parsed['raw_xml'], parsed['namespaces'])
+
+        assert payloads == [SPLICE_INSERT_CUE, TIME_SIGNAL_CUE]
+
+    def test_builds_markers_with_manifest_timing(self):
+        """Event id, presentation time and duration come from the manifest"""
+        parsed = dash_parser.parse_mpd_document(SCTE35_MPD.encode('utf-8'))
+        splice_insert, time_signal = scte35_parser.extract_dash_scte35(
+            parsed['raw_xml'], parsed['namespaces']
+        )
+
+        assert splice_insert.event_id == 1
+        assert splice_insert.pts == 900000
+        assert splice_insert.duration == 30.0
+        assert splice_insert.command_type == 'splice_insert'
+        assert splice_insert.out_of_network is True
+        assert splice_insert.auto_return is True
+
+        assert time_signal.command_type == 'time_signal'
+        assert time_signal.segmentation_type == 'Type 53'
+        assert time_signal.upid == '0x2ca0a18a'
+
+
+class TestScte35SchemeRe:
+    """Tests for SCTE35_SCHEME_RE"""
+
+    @pytest.mark.parametrize("scheme_id_uri,variant", [
+        ("urn:scte:scte35:2013:bin", "bin"),
+        ("urn:scte:scte35:2014:bin", "bin"),
+        ("urn:scte:scte35:2014:xml+bin", "xml+bin"),
+        ("urn:scte:scte35:2013:xml", "xml"),
+        ("urn:scte:scte35:2013:binary", None),
+        ("urn:example:id3", None),
+    ])
+    def test_classifies_scheme(self, scheme_id_uri, variant):
+        """SCTE-35 schemes are accepted and tagged with their payload variant"""
+        match = scte35_parser.SCTE35_SCHEME_RE.match(scheme_id_uri)
+        assert (match.group(1) if match else None) == variant
+
+
+class TestBuildScte35Marker:
+    """Tests for build_scte35_marker"""
+
+    @pytest.mark.parametrize("cue", [SPLICE_INSERT_CUE, TIME_SIGNAL_CUE])
+    def test_unvalidated_markers_match_schema(self, cue):
+        """Markers built without validation should survive validation unchanged"""
+        marker = scte35_parser.build_scte35_marker(scte35_parser.parse_scte35_data(cue))
+        assert SCTE35Marker.model_validate(marker.model_dump()) == marker
+
+    def test_manifest_values_override_cue(self):
+        """Event id, pts and duration from the manifest take precedence"""
+        marker = scte35_parser.build_scte35_marker(
+            scte35_parser.parse_scte35_data(TIME_SIGNAL_CUE), event_id=7, pts=0, duration=30.0
+        )
+
+        assert (marker.event_id, marker.pts, marker.duration) == (7, 0, 30.0)
+
+    def test_schema_still_rejects_invalid_markers(self):
+        """Validation of directly constructed markers is unchanged"""
+        from pydantic import ValidationError
+
+        with pytest.raises(ValidationError):
+            SCTE35Marker(event_id='0x4800008e', command_type=6)
+
+
+class TestExtractScte35Markers:
+    """Tests for extract_scte35_markers"""
+
+    async def test_limit_stops_at_first_markers(self):
+        """A limit should return only the leading markers"""
+        parsed = dash_parser.parse_mpd_document(SCTE35_MPD.encode('utf-8'))
+
+        markers = await scte35_parser.extract_scte35_markers(
+            "https://example.com/stream.mpd", 'dash', parsed, limit=1
+        )
+
+        assert [marker.event_id for marker in markers] == [1]
+
+    async def test_extraction_errors_are_logged(self, monkeypatch, caplog):
+        """A failing extraction should be logged and yield no markers"""
+        def fail_collect(manifest_type, parsed_data, limit=None):
+            raise ValueError("broken manifest")
+
+        monkeypatch.setattr(scte35_parser, "collect_scte35_markers", fail_collect)
+
+        with caplog.at_level("ERROR", logger=scte35_parser.__name__):
+            markers = await scte35_parser.extract_scte35_markers(
+                "https://example.com/stream.mpd", 'dash', {}
+            )
+
+        assert markers == []
+        assert "Error extracting SCTE-35 markers: broken manifest" in caplog.text
+
+
+class TestExtractHlsScte35:
+    """Tests for extract_hls_scte35"""
+
+    def test_parses_scte35_tags_and_dateranges(self):
+        """Base64 cue tags and hex DATERANGE cues become markers"""
+        splice_insert_hex = "0x" + scte35_parser.b64decode(SPLICE_INSERT_CUE).hex().upper()
+        playlist = m3u8.loads(f"""#EXTM3U
+#EXT-X-TARGETDURATION:6
+#EXT-X-DATERANGE:ID="ad-1",START-DATE="2024-01-01T00:00:00Z",DURATION=30.0,SCTE35-OUT={splice_insert_hex}
+#EXTINF:6,
+a.ts
+#EXT-OATCLS-SCTE35:{TIME_SIGNAL_CUE}
+#EXT-X-CUE-OUT:30
+#EXTINF:6,
+b.ts
+""")
+
+        splice_insert, time_signal = scte35_parser.extract_hls_scte35(playlist)
+
+        assert time_signal.command_type == 'time_signal'
+        assert splice_insert.command_type == 'splice_insert'
+        assert splice_insert.event_id == 1
+        assert splice_insert.duration == 30.0